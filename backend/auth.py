@@ -1,22 +1,38 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Depends, HTTPException, status, WebSocket, Query
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 from database import get_db
 from models.user import User
 from schemas.token import TokenData
 from passlib.context import CryptContext
+from token_cache import Principal, token_cache
 
 # Настройки JWT
 SECRET_KEY = "your-secret-key"  # В продакшене использовать безопасный ключ
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Стоимость bcrypt; при ее изменении хеши пересчитываются при следующем входе
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Потоки для bcrypt и предел ожидающих операций: лишние попытки входа получают 503
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(HASH_MAX_PENDING)
+# Хеш для проверки несуществующих пользователей, чтобы время ответа не выдавало их отсутствие
+_DUMMY_HASH = pwd_context.hash("dummy-password")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка пароля"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,15 +41,39 @@ def get_password_hash(password: str) -> str:
     """Хеширование пароля"""
     return pwd_context.hash(password)
 
-def get_user(db: Session, username: str) -> Optional[User]:
+async def run_hashing(func, *args):
+    """Выполнить bcrypt в пуле потоков, не блокируя event loop"""
+    if _hash_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Слишком много попыток входа, повторите позже"
+        )
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+async def aget_password_hash(password: str) -> str:
+    """Хеширование пароля в пуле потоков"""
+    return await run_hashing(pwd_context.hash, password)
+
+async def get_user(db: AsyncSession, username: str) -> Optional[User]:
     """Получить пользователя по имени"""
-    return db.query(User).filter(User.username == username).first()
+    result = await db.execute(select(User).filter(User.username == username))
+    return result.scalars().first()
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """Аутентификация пользователя"""
-    user = get_user(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+    user = await get_user(db, username)
+    if not user:
+        await run_hashing(pwd_context.verify, password, _DUMMY_HASH)
         return None
+
+    verified, new_hash = await run_hashing(pwd_context.verify_and_update, password, user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        # Прозрачный пересчет хеша под текущую стоимость bcrypt
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -47,7 +87,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def resolve_principal(token: str, db: AsyncSession) -> Optional[Principal]:
+    """Проверить токен и найти пользователя; повторные запросы с тем же токеном идут из кэша"""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        if username is None:
+            return None
+        token_data = TokenData(username=username)
+    except JWTError:
+        return None
+
+    user = await get_user(db, username=token_data.username)
+    if user is None or not user.is_active:
+        return None
+
+    principal = Principal.from_user(user)
+    token_cache.put(token, payload, principal)
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     """Получить текущего пользователя из токена"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,16 +118,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-        
-    user = get_user(db, username=token_data.username)
+    user = await resolve_principal(token, db)
     if user is None:
         raise credentials_exception
     return user
@@ -72,21 +126,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
 async def get_current_user_ws(
     websocket: WebSocket,
     token: str = Query(...),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
     """Получить текущего пользователя из WebSocket-соединения"""
     credentials_exception = WebSocketException(code=status.HTTP_401_UNAUTHORIZED)
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    
-    user = get_user(db, username=token_data.username)
+    user = await resolve_principal(token, db)
     if user is None:
         raise credentials_exception
         
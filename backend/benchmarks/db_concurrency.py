@@ -0,0 +1,127 @@
+"""Задержки запросов и блокировка event loop при синхронном и асинхронном доступе к базе.
+
+Режим sync воспроизводит прежнее поведение (блокирующий Session внутри async def),
+режим async - текущий AsyncSession. Запуск из каталога backend:
+    python -m benchmarks.db_concurrency --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+DB_PATH = os.path.abspath("bench_notifications.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from database import Base, SessionLocal
+from models import User, Notification
+from benchmarks.stats import percentile
+
+
+def seed(users: int, per_user: int):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        db.execute(Notification.__table__.insert(), [
+            {"type": "system", "message": f"message {n}", "user_id": i, "read": n % 3 == 0}
+            for i in range(1, users + 1)
+            for n in range(per_user)
+        ])
+        db.commit()
+    engine.dispose()
+
+
+def create_app(mode: str) -> FastAPI:
+    app = FastAPI()
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+
+    if mode == "sync":
+        @app.get("/notifications/{user_id}")
+        async def sync_notifications(user_id: int):
+            with Session(sync_engine) as db:
+                rows = db.query(Notification).filter(Notification.user_id == user_id).all()
+            return {"count": len(rows)}
+    else:
+        @app.get("/notifications/{user_id}")
+        async def async_notifications(user_id: int):
+            async with SessionLocal() as db:
+                result = await db.execute(select(Notification).filter(Notification.user_id == user_id))
+                rows = result.scalars().all()
+            return {"count": len(rows)}
+
+    return app
+
+
+async def probe_loop_lag(lags: list, stop: asyncio.Event, interval: float = 0.005):
+    """Насколько позже запланированного просыпается корутина"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(mode: str, users: int, concurrency: int, requests: int) -> dict:
+    app = create_app(mode)
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    counter = iter(range(requests))
+
+    async def client(http: httpx.AsyncClient):
+        for n in counter:
+            started = time.perf_counter()
+            response = await http.get(f"/notifications/{n % users + 1}")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    return {
+        "mode": mode,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "loop_lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "loop_lag_max_ms": max(lags, default=0.0) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--per-user", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.users, args.per_user)
+    try:
+        for mode in ("sync", "async"):
+            report = asyncio.run(run(mode, args.users, args.concurrency, args.requests))
+            print(
+                f"{report['mode']:>5}: {report['rps']:.0f} req/s, "
+                f"p50={report['p50_ms']:.1f}ms p95={report['p95_ms']:.1f}ms p99={report['p99_ms']:.1f}ms, "
+                f"loop lag p99={report['loop_lag_p99_ms']:.1f}ms max={report['loop_lag_max_ms']:.1f}ms"
+            )
+    finally:
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Пропускная способность /token и задержка event loop во время всплеска входов.
+
+Режим pool - текущий (bcrypt в пуле потоков), режим inline - bcrypt прямо
+в event loop для сравнения. Запуск из каталога backend:
+    python -m benchmarks.login --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import time
+
+DB_PATH = os.path.abspath("bench_login.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+# Лимит ожидающих операций выше размера всплеска, чтобы измерять пропускную способность, а не отказы
+os.environ.setdefault("HASH_MAX_PENDING", "10000")
+
+import httpx
+import auth
+from main import app
+from database import SessionLocal
+from models import User
+from benchmarks.db_concurrency import probe_loop_lag
+from benchmarks.stats import percentile
+
+
+async def inline_hashing(func, *args):
+    return func(*args)
+
+
+async def run(mode: str, logins: int, concurrency: int) -> dict:
+    auth.run_hashing = auth.run_hashing if mode == "pool" else inline_hashing
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    counter = iter(range(logins))
+
+    async def client(http: httpx.AsyncClient):
+        for _ in counter:
+            started = time.perf_counter()
+            response = await http.post("/token", data={"username": "bench", "password": "secret"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return {
+        "mode": mode,
+        "logins_per_s": logins / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "loop_lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "loop_lag_max_ms": max(lags, default=0.0) * 1000
+    }
+
+
+async def main_async(logins: int, concurrency: int):
+    async with app.router.lifespan_context(app):
+        async with SessionLocal() as db:
+            db.add(User(username="bench", email="bench@example.com", hashed_password=auth.get_password_hash("secret")))
+            await db.commit()
+        pool = auth.run_hashing
+        for mode in ("inline", "pool"):
+            report = await run(mode, logins, concurrency)
+            auth.run_hashing = pool
+            print(
+                f"{report['mode']:>6}: {report['logins_per_s']:.1f} logins/s, "
+                f"p50={report['p50_ms']:.0f}ms p99={report['p99_ms']:.0f}ms, "
+                f"loop lag p99={report['loop_lag_p99_ms']:.1f}ms max={report['loop_lag_max_ms']:.1f}ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    try:
+        asyncio.run(main_async(args.logins, args.concurrency))
+    finally:
+        os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
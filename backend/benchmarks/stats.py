@@ -0,0 +1,6 @@
+"""Общие функции бенчмарков backend"""
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
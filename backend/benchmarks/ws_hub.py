@@ -0,0 +1,94 @@
+"""Нагрузочный тест WebSocket-хаба на тысячах локальных клиентов.
+
+Запуск из каталога backend:
+    python -m benchmarks.ws_hub --clients 5000 --messages 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from hub import NotificationHub
+from benchmarks.stats import percentile
+
+
+class FakeWebSocket:
+    """Имитация клиента: отправка занимает delay секунд"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message: dict):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(clients: int, messages: int, slow_ratio: float, slow_delay: float, queue_size: int, policy: str):
+    hub = NotificationHub(queue_size=queue_size, slow_consumer_policy=policy)
+    rng = random.Random(1)
+    sockets = []
+    for i in range(clients):
+        websocket = FakeWebSocket(slow_delay if rng.random() < slow_ratio else 0.0)
+        sockets.append(websocket)
+        # Каждый десятый пользователь открыл второе устройство
+        await hub.connect(websocket, user_id=i // 2 if i % 10 == 0 else i, topics=["all"])
+
+    publish_times = []
+    started = time.perf_counter()
+    for n in range(messages):
+        t = time.perf_counter()
+        hub.publish("all", {"type": "system", "message": f"event {n}"})
+        publish_times.append(time.perf_counter() - t)
+        # Даем писателям поработать между событиями
+        await asyncio.sleep(0)
+    depth_after_publish = hub.stats()["queue_depth_total"]
+
+    # Ждем, пока быстрые клиенты разберут свои очереди
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline:
+        fast_pending = sum(
+            connection.queue.qsize()
+            for connections in hub.user_connections.values()
+            for connection in connections
+            if not connection.websocket.delay
+        )
+        if not fast_pending:
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    stats = hub.stats()
+    fast = [websocket.received for websocket in sockets if not websocket.delay]
+    print(f"clients={clients} messages={messages} policy={policy} queue_size={queue_size}")
+    print(f"publish p50={percentile(publish_times, 0.5) * 1000:.2f}ms p99={percentile(publish_times, 0.99) * 1000:.2f}ms")
+    print(f"delivered={stats['sent']} in {elapsed:.2f}s ({stats['sent'] / elapsed:.0f} msg/s)")
+    print(f"fast clients fully served: {sum(r == messages for r in fast)}/{len(fast)}")
+    print(f"queue depth after publish={depth_after_publish} now total={stats['queue_depth_total']} max={stats['queue_depth_max']}")
+    print(f"dropped={stats['dropped']} slow_disconnects={stats['slow_disconnects']} connections={stats['connections']}")
+
+    for connections in list(hub.user_connections.values()):
+        for connection in list(connections):
+            hub.disconnect(connection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--policy", choices=["drop", "disconnect"], default="drop")
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.messages, args.slow_ratio, args.slow_delay, args.queue_size, args.policy))
+
+
+if __name__ == "__main__":
+    main()
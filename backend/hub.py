@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Политики для медленных клиентов, чья очередь переполнилась
+DROP_OLDEST = "drop"
+DISCONNECT = "disconnect"
+
+
+class Connection:
+    """WebSocket-соединение с собственной очередью исходящих сообщений и задачей-писателем"""
+
+    def __init__(self, websocket: WebSocket, user_id: int, topics: Iterable[str], queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.topics = set(topics)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.writer: asyncio.Task = None
+
+
+class NotificationHub:
+    """Рассылка уведомлений по нескольким соединениям на пользователя и по темам"""
+
+    def __init__(self, queue_size: int = 100, slow_consumer_policy: str = DROP_OLDEST):
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.user_connections: Dict[int, Set[Connection]] = defaultdict(set)
+        self.topic_connections: Dict[str, Set[Connection]] = defaultdict(set)
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+
+    async def connect(self, websocket: WebSocket, user_id: int, topics: Iterable[str] = ()) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, user_id, topics, self.queue_size)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.user_connections[user_id].add(connection)
+        for topic in connection.topics:
+            self.topic_connections[topic].add(connection)
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connections = self.user_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.user_connections[connection.user_id]
+        for topic in connection.topics:
+            subscribers = self.topic_connections.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.topic_connections[topic]
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    def send_to_user(self, user_id: int, message: dict) -> int:
+        """Поставить сообщение в очереди всех соединений пользователя, не дожидаясь отправки"""
+        return self._fan_out(self.user_connections.get(user_id, ()), message)
+
+    def publish(self, topic: str, message: dict) -> int:
+        """Поставить сообщение в очереди всех подписчиков темы"""
+        return self._fan_out(self.topic_connections.get(topic, ()), message)
+
+    async def send_notification(self, user_id: int, message: dict):
+        self.send_to_user(user_id, message)
+
+    def _fan_out(self, connections: Iterable[Connection], message: dict) -> int:
+        delivered = 0
+        for connection in list(connections):
+            delivered += self._enqueue(connection, message)
+        return delivered
+
+    def _enqueue(self, connection: Connection, message: dict) -> bool:
+        try:
+            connection.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == DISCONNECT:
+            self.slow_disconnects += 1
+            self.disconnect(connection)
+            asyncio.create_task(self._close(connection, code=1013))
+            return False
+
+        # Вытесняем самое старое сообщение, чтобы клиент получил свежие
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(message)
+        connection.dropped += 1
+        self.dropped += 1
+        return True
+
+    async def _write(self, connection: Connection):
+        try:
+            while True:
+                message = await connection.queue.get()
+                await connection.websocket.send_json(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Клиент отключился или сокет сломан
+            self.disconnect(connection)
+
+    async def _close(self, connection: Connection, code: int):
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            logger.debug("Соединение пользователя %s уже закрыто", connection.user_id)
+
+    def stats(self) -> dict:
+        """Метрики хаба: соединения, глубина очередей, потери"""
+        depths = [
+            connection.queue.qsize()
+            for connections in self.user_connections.values()
+            for connection in connections
+        ]
+        return {
+            "users": len(self.user_connections),
+            "connections": len(depths),
+            "topics": {topic: len(subscribers) for topic, subscribers in self.topic_connections.items()},
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_size": self.queue_size,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects
+        }
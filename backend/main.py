@@ -1,13 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import notifications, websockets
+from routers import notifications, websockets, token
 from database import engine, Base
 
 app = FastAPI()
 
-# Создание таблиц в базе данных
-Base.metadata.create_all(bind=engine)
-
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -15,10 +12,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы уведомлений
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Подключение роутеров
 app.include_router(notifications.router)
 app.include_router(websockets.router)
+app.include_router(token.router)
+
+# ... остальные роутеры ...
+
+def create_missing_indexes(conn):
+    """Создать индексы, объявленные в моделях уже существующих таблиц.
+
+    create_all пропускает существующие таблицы вместе с их индексами,
+    поэтому новые индексы (например, частичный по непрочитанным) добавляем отдельно.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+@app.on_event("startup")
+async def startup():
+    # Создание таблиц в базе данных
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+
+    # Подписываемся на общую шину уведомлений
+    await websockets.start_pubsub()
 
-# ... остальные роутеры ... 
\ No newline at end of file
+@app.on_event("shutdown")
+async def shutdown():
+    await websockets.stop_pubsub()
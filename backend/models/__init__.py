@@ -1,2 +1,2 @@
 from .user import User
-from .notification import Notification 
\ No newline at end of file
+from .notification import Notification, NotificationCounter 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -16,5 +16,22 @@ class Notification(Base):
     # Отношения
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        # Лента пользователя с постраничной выдачей по id
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        # Частичный индекс только по непрочитанным
+        Index(
+            "ix_notifications_user_unread", "user_id", "id",
+            postgresql_where=text("NOT read"),
+            sqlite_where=text("read = 0")
+        ),
+    )
+
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class NotificationCounter(Base):
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)  # поддерживается инкрементально 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class LocalPubSub:
+    """Шина сообщений внутри одного процесса (один воркер, тесты)"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    async def publish(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, []):
+            await handler(message)
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def close(self):
+        self._handlers.clear()
+
+
+class RedisPubSub:
+    """Шина сообщений через Redis pub/sub: каждый воркер получает все сообщения"""
+
+    def __init__(self, client=None, url: Optional[str] = None, reconnect_delay: float = 1.0):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost"), decode_responses=True)
+        self._client = client
+        self._reconnect_delay = reconnect_delay
+        self._tasks: List[asyncio.Task] = []
+
+    async def publish(self, channel: str, message: dict):
+        await self._client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self._tasks.append(asyncio.create_task(self._listen(channel, handler)))
+
+    async def _listen(self, channel: str, handler: Handler):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    try:
+                        await handler(json.loads(item["data"]))
+                    except Exception:
+                        logger.exception("Ошибка доставки сообщения из канала %s", channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Потеряно соединение с Redis, переподписка на %s", channel)
+                await asyncio.sleep(self._reconnect_delay)
+            finally:
+                await pubsub.close()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._client.close()
+
+
+def create_pubsub():
+    """Выбрать шину по переменной окружения NOTIFY_PUBSUB (local или redis)"""
+    if os.getenv("NOTIFY_PUBSUB", "local") == "redis":
+        return RedisPubSub()
+    return LocalPubSub()
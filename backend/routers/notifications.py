@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from database import get_db
 from models.notification import Notification
-from schemas.notification import NotificationCreate, NotificationResponse, NotificationUpdate
+from schemas.notification import NotificationCreate, NotificationResponse, NotificationUpdate, UnreadCount
 from auth import get_current_user
 from schemas.user import User
+from unread import adjust_unread, get_unread_count, unread_cache
+from routers.websockets import send_notification_ws
 
 router = APIRouter(
     prefix="/notifications",
@@ -14,44 +17,107 @@ router = APIRouter(
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
+    limit: int = Query(50, gt=0, le=200),
+    cursor: Optional[int] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Получить все уведомления текущего пользователя"""
-    return db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
+    """Получить уведомления текущего пользователя, новые первыми.
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
+    query = select(Notification).filter(Notification.user_id == current_user.id)
+    if cursor is not None:
+        query = query.filter(Notification.id < cursor)
+    result = await db.execute(query.order_by(Notification.id.desc()).limit(limit + 1))
+    notifications = result.scalars().all()
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        response.headers["X-Next-Cursor"] = str(notifications[-1].id)
+    return notifications
+
+@router.get("/unread-count", response_model=UnreadCount)
+async def unread_count(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Количество непрочитанных уведомлений для значка в интерфейсе"""
+    return {"unread": await get_unread_count(db, current_user.id)}
+
+@router.post("/", response_model=NotificationResponse)
+async def create_notification(
+    notification: NotificationCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Создать уведомление (только для администраторов)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+
+    db_notification = Notification(**notification.model_dump())
+    db.add(db_notification)
+    await db.flush()
+    unread = await adjust_unread(db, db_notification.user_id, 1)
+    await db.commit()
+    await db.refresh(db_notification)
+    unread_cache.set(db_notification.user_id, unread)
+
+    await send_notification_ws(db_notification.user_id, {
+        **NotificationResponse.model_validate(db_notification).model_dump(mode="json"),
+        "unread": unread
+    })
+    return db_notification
 
 @router.post("/{notification_id}/read", response_model=NotificationResponse)
 async def mark_as_read(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Отметить уведомление как прочитанное"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    # Условное обновление: счетчик уменьшается только при реальном изменении
+    marked = await db.execute(
+        update(Notification).where(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id,
+            Notification.read == False
+        ).values(read=True)
+    )
+    if marked.rowcount:
+        unread = await adjust_unread(db, current_user.id, -1)
+
+    result = await db.execute(
+        select(Notification).filter(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id
+        )
+    )
+    notification = result.scalar_one_or_none()
     
     if not notification:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
     
-    notification.read = True
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
+    if marked.rowcount:
+        unread_cache.set(current_user.id, unread)
     return notification
 
 @router.post("/read-all")
 async def mark_all_as_read(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Отметить все уведомления пользователя как прочитанные"""
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read == False
-    ).update({"read": True})
+    marked = await db.execute(
+        update(Notification).where(
+            Notification.user_id == current_user.id,
+            Notification.read == False
+        ).values(read=True)
+    )
+    unread = await adjust_unread(db, current_user.id, -marked.rowcount)
     
-    db.commit()
-    return {"message": "Все уведомления отмечены как прочитанные"} 
\ No newline at end of file
+    await db.commit()
+    unread_cache.set(current_user.id, unread)
+    return {"message": "Все уведомления отмечены как прочитанные"}
@@ -1,46 +1,59 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict
+import os
 from auth import get_current_user_ws
 from schemas.user import User
+from hub import NotificationHub
+from pubsub import create_pubsub
 
 router = APIRouter()
 
-# Хранилище активных подключений
-class ConnectionManager:
-    def __init__(self):
-        # user_id -> WebSocket
-        self.active_connections: Dict[int, WebSocket] = {}
+# Хаб активных подключений: несколько соединений на пользователя, очередь на каждое
+manager = NotificationHub(
+    queue_size=int(os.getenv("WS_QUEUE_SIZE", "100")),
+    slow_consumer_policy=os.getenv("WS_SLOW_CONSUMER_POLICY", "drop")
+)
 
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
+# Общая для всех воркеров шина: каждый доставляет сообщения только своим соединениям
+NOTIFICATIONS_CHANNEL = "notifications"
+bus = create_pubsub()
 
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+async def _deliver(message: dict):
+    if "topic" in message:
+        manager.publish(message["topic"], message["data"])
+    else:
+        manager.send_to_user(message["user_id"], message["data"])
 
-    async def send_notification(self, user_id: int, message: dict):
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-            except WebSocketDisconnect:
-                self.disconnect(user_id)
+async def start_pubsub():
+    await bus.subscribe(NOTIFICATIONS_CHANNEL, _deliver)
 
-manager = ConnectionManager()
+async def stop_pubsub():
+    await bus.close()
 
 @router.websocket("/ws/notifications")
 async def websocket_endpoint(
     websocket: WebSocket,
     current_user: User = Depends(get_current_user_ws)
 ):
-    await manager.connect(websocket, current_user.id)
+    topics = ["admins"] if current_user.is_admin else []
+    connection = await manager.connect(websocket, current_user.id, topics)
     try:
         while True:
             # Ждем сообщений от клиента для поддержания соединения
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(current_user.id)
+        pass
+    finally:
+        manager.disconnect(connection)
+
+@router.get("/ws/stats")
+async def websocket_stats():
+    """Метрики WebSocket-хаба"""
+    return manager.stats()
 
 # Функция для отправки уведомлений через WebSocket
 async def send_notification_ws(user_id: int, notification_data: dict):
-    await manager.send_notification(user_id, notification_data) 
\ No newline at end of file
+    await bus.publish(NOTIFICATIONS_CHANNEL, {"user_id": user_id, "data": notification_data})
+
+# Функция для рассылки уведомлений всем подписчикам темы (например, "admins")
+async def broadcast_notification_ws(topic: str, notification_data: dict):
+    await bus.publish(NOTIFICATIONS_CHANNEL, {"topic": topic, "data": notification_data})
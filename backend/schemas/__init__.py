@@ -1,3 +1,3 @@
 from .user import User, UserCreate, UserUpdate
-from .notification import NotificationCreate, NotificationResponse, NotificationUpdate
+from .notification import NotificationCreate, NotificationResponse, NotificationUpdate, UnreadCount
 from .token import Token, TokenData 
\ No newline at end of file
@@ -19,4 +19,7 @@ class NotificationResponse(NotificationBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class UnreadCount(BaseModel):
+    unread: int
\ No newline at end of file
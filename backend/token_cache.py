@@ -0,0 +1,99 @@
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Снимок пользователя для кэша токенов.
+
+    Не схема API: email в базе не проверяется на формат и может быть пустым,
+    поэтому валидация EmailStr ломала бы аутентификацию таких пользователей.
+    """
+    id: int
+    username: str
+    email: Optional[str]
+    is_active: bool
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin)
+        )
+
+
+class TokenCache:
+    """Кэш токен -> (claims, пользователь) с коротким временем жизни"""
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 50000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[str, Tuple[float, dict, Principal]] = {}
+        self._tokens_by_user: Dict[str, Set[str]] = defaultdict(set)
+
+    def get(self, token: str) -> Optional[Principal]:
+        entry = self._data.get(token)
+        if entry is None:
+            return None
+        expires_at, claims, principal = entry
+        if expires_at < time.monotonic():
+            self._pop(token)
+            return None
+        return principal
+
+    def put(self, token: str, claims: dict, principal: Principal):
+        # Запись не должна пережить сам токен
+        ttl = self.ttl
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - time.time())
+        if ttl <= 0:
+            return
+        if len(self._data) >= self.maxsize:
+            self._pop(next(iter(self._data)))
+        self._data[token] = (time.monotonic() + ttl, claims, principal)
+        self._tokens_by_user[claims["sub"]].add(token)
+
+    def invalidate_user(self, username: str):
+        """Сбросить все закэшированные токены пользователя"""
+        for token in self._tokens_by_user.pop(username, set()):
+            self._data.pop(token, None)
+
+    def _pop(self, token: str):
+        entry = self._data.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[1]["sub"])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[1]["sub"]]
+
+
+token_cache = TokenCache(ttl=float(os.getenv("TOKEN_CACHE_TTL", "60")))
+
+# Изменения, после которых закэшированный пользователь устаревает
+_SENSITIVE_FIELDS = ("username", "is_active", "is_admin", "hashed_password", "email")
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_changed_user(mapper, connection, target: User):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in _SENSITIVE_FIELDS):
+        return
+    usernames = {target.username}
+    usernames.update(state.attrs.username.history.deleted or ())
+    for username in usernames:
+        token_cache.invalidate_user(username)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User):
+    token_cache.invalidate_user(target.username)
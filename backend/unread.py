@@ -0,0 +1,89 @@
+import os
+import time
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.notification import Notification, NotificationCounter
+
+
+class UnreadCountCache:
+    """Кэш счетчиков непрочитанных уведомлений по пользователям"""
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._data: Dict[int, Tuple[float, int]] = {}
+
+    def get(self, user_id: int) -> Optional[int]:
+        entry = self._data.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id: int, unread: int):
+        self._data[user_id] = (time.monotonic() + self.ttl, unread)
+
+    def invalidate(self, user_id: int):
+        self._data.pop(user_id, None)
+
+
+unread_cache = UnreadCountCache(ttl=float(os.getenv("UNREAD_CACHE_TTL", "30")))
+
+
+async def _create_counter(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Создать счетчик по текущему состоянию уведомлений.
+
+    COUNT(*) выполняется один раз на пользователя, для уведомлений,
+    созданных до появления счетчиков. Возвращает None, если счетчик
+    успел создать параллельный запрос.
+    """
+    unread = await db.scalar(
+        select(func.count()).select_from(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.read == False
+        )
+    )
+    try:
+        async with db.begin_nested():
+            db.add(NotificationCounter(user_id=user_id, unread=unread))
+    except IntegrityError:
+        return None
+    return unread
+
+
+def _increment(user_id: int, delta: int):
+    return (
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread=NotificationCounter.unread + delta)
+        .returning(NotificationCounter.unread)
+    )
+
+
+async def adjust_unread(db: AsyncSession, user_id: int, delta: int) -> int:
+    """Изменить счетчик на delta после изменения уведомлений и вернуть новое значение"""
+    result = await db.execute(_increment(user_id, delta))
+    unread = result.scalar_one_or_none()
+    if unread is None:
+        # Счетчика еще нет: он строится по уже измененным данным, delta в нем учтена
+        unread = await _create_counter(db, user_id)
+        if unread is None:
+            result = await db.execute(_increment(user_id, delta))
+            unread = result.scalar_one()
+    return unread
+
+
+async def get_unread_count(db: AsyncSession, user_id: int) -> int:
+    """Количество непрочитанных: из кэша или одной строкой по первичному ключу"""
+    unread = unread_cache.get(user_id)
+    if unread is not None:
+        return unread
+
+    unread = await db.scalar(select(NotificationCounter.unread).filter(NotificationCounter.user_id == user_id))
+    if unread is None:
+        unread = await _create_counter(db, user_id)
+        if unread is None:
+            unread = await db.scalar(select(NotificationCounter.unread).filter(NotificationCounter.user_id == user_id))
+        await db.commit()
+    unread_cache.set(user_id, unread)
+    return unread
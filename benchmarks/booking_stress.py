@@ -0,0 +1,104 @@
+"""Стресс-тест параллельного создания бронирований.
+
+Запускает множество одновременных POST /bookings/ на небольшой набор
+компьютеров с пересекающимися интервалами и считает пропускную способность
+и число двойных бронирований (должно быть 0). С флагом --no-locks
+полосатые блокировки отключаются для сравнения.
+
+    DATABASE_URL=sqlite+aiosqlite:///./stress.db python -m benchmarks.booking_stress
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./stress.db")
+
+import httpx
+from contextlib import asynccontextmanager
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from models.database import engine
+from models.models import Booking
+from benchmarks.seed import seed
+
+
+class NoLocks:
+    @asynccontextmanager
+    async def hold(self, *keys):
+        yield
+
+
+async def count_double_bookings(session_engine) -> int:
+    """Пары активных бронирований одного компьютера с пересекающимися интервалами"""
+    other = aliased(Booking)
+    async with session_engine.connect() as conn:
+        return await conn.scalar(
+            select(func.count()).select_from(Booking).join(
+                other,
+                (other.computer_id == Booking.computer_id) & (other.id > Booking.id)
+            ).filter(
+                Booking.status == "active",
+                other.status == "active",
+                Booking.start_time < other.end_time,
+                Booking.end_time > other.start_time
+            )
+        )
+
+
+async def run(requests: int, concurrency: int, computers: int, no_locks: bool):
+    from main import app
+    from routers import bookings
+
+    await seed(engine, users=1000, computers=computers, bookings=0, transactions=1)
+    if no_locks:
+        bookings.computer_locks = NoLocks()
+
+    rng = random.Random(7)
+    base = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=30)
+    payloads = []
+    for _ in range(requests):
+        start = base + timedelta(hours=rng.randint(0, 23))
+        payloads.append((rng.randint(1, 1000), {
+            "computer_id": rng.randint(1, computers),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=rng.randint(1, 3))).isoformat()
+        }))
+    queue = iter(payloads)
+    statuses = {}
+
+    async def client(http: httpx.AsyncClient):
+        for user_id, payload in queue:
+            try:
+                response = await http.post("/bookings/", params={"user_id": user_id}, json=payload)
+                status = response.status_code
+            except Exception:
+                # ASGITransport пробрасывает необработанные ошибки сервера
+                status = 500
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stress") as http:
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(f"locks={'off' if no_locks else 'on'} requests={requests} concurrency={concurrency} computers={computers}")
+    print(f"throughput={requests / elapsed:.0f} req/s statuses={statuses}")
+    print(f"double bookings={await count_double_bookings(engine)}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--computers", type=int, default=10)
+    parser.add_argument("--no-locks", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.computers, args.no_locks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Сравнение двух прогонов benchmarks/run.py.
+
+Печатает изменение задержек и пропускной способности по каждому сценарию
+и завершается с кодом 1, если какой-либо сценарий стал хуже порога.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Метрика -> True, если рост значения означает ухудшение
+METRICS = {"rps": False, "p50_ms": True, "p95_ms": True, "p99_ms": True}
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """Строки таблицы сравнения: (сценарий, метрика, было, стало, изменение в %, ухудшение)"""
+    rows = []
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        for metric, higher_is_worse in METRICS.items():
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            worse = change > threshold if higher_is_worse else change < -threshold
+            rows.append((name, metric, old[metric], new[metric], change, worse))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимое ухудшение в процентах")
+    args = parser.parse_args()
+
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    print(f"{before['meta']['revision']} -> {after['meta']['revision']}")
+    regressions = 0
+    for name, metric, old, new, change, worse in compare(before, after, args.threshold):
+        regressions += worse
+        marker = "  <-- хуже" if worse else ""
+        print(f"{name:20} {metric:7} {old:10.1f} {new:10.1f} {change:+7.1f}%{marker}")
+
+    missing = set(before["scenarios"]) ^ set(after["scenarios"])
+    if missing:
+        print(f"Сценарии есть только в одном прогоне: {', '.join(sorted(missing))}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Проверка планов горячих запросов из routers/: ни один не должен сканировать таблицу целиком.
+
+Создает схему миграциями alembic, наполняет базу большим набором данных и завершается
+с ненулевым кодом, если в плане какого-либо запроса встречается полный проход по таблице.
+Запросы строятся теми же функциями, что и в роутерах.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from models.models import Booking, Transaction
+from routers.bookings import overlap_query, user_bookings_query
+from routers.computers import availability_query
+from routers.transactions import user_transactions_query
+from services.pagination import page_query
+from benchmarks.seed import seed
+
+
+def hot_queries():
+    """Запросы из routers/, планы которых должны использовать индексы"""
+    now = datetime.utcnow()
+    later = now + timedelta(hours=2)
+    return {
+        # routers/bookings.py::create_booking
+        "booking_overlap": overlap_query(17, now, later),
+        # routers/bookings.py::get_user_bookings
+        "user_bookings_page": page_query(user_bookings_query(42), Booking, 100, 1000),
+        # routers/transactions.py::get_user_transactions
+        "user_transactions_page": page_query(user_transactions_query(42), Transaction, 100, 1000),
+        # routers/computers.py::get_availability
+        "availability_window": availability_query(now, later),
+    }
+
+
+async def explain(conn: AsyncConnection, query) -> str:
+    """Получить план запроса в текстовом виде"""
+    compiled = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "postgresql":
+        result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+        return json.dumps(result.scalar())
+    result = await conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return "\n".join(row[-1] for row in result.all())
+
+
+def has_full_scan(dialect: str, plan: str) -> bool:
+    """Есть ли в плане полный проход по таблице"""
+    if dialect == "postgresql":
+        return '"Seq Scan"' in plan
+    return any(
+        line.strip().startswith("SCAN") and "USING" not in line
+        for line in plan.splitlines()
+    )
+
+
+async def check_plans(url: str, reseed: bool, bookings: int) -> int:
+    engine = create_async_engine(url)
+    try:
+        if reseed:
+            await seed(engine, users=10000, computers=200, bookings=bookings)
+        failures = 0
+        async with engine.connect() as conn:
+            for name, query in hot_queries().items():
+                plan = await explain(conn, query)
+                full_scan = has_full_scan(conn.dialect.name, plan)
+                failures += full_scan
+                print(f"[{'FAIL' if full_scan else 'ok'}] {name}")
+                if full_scan:
+                    print(plan)
+        return failures
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--bookings", type=int, default=300000)
+    parser.add_argument("--no-seed", action="store_true", help="использовать уже наполненную базу")
+    args = parser.parse_args()
+    failures = asyncio.run(check_plans(args.url, not args.no_seed, args.bookings))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
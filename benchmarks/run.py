@@ -0,0 +1,192 @@
+"""Нагрузочный бенчмарк горячих эндпоинтов API.
+
+Наполняет базу (по умолчанию 10k пользователей, 200 компьютеров, 1M бронирований),
+прогоняет приложение в процессе через httpx.ASGITransport и для каждого сценария
+считает p50/p95/p99 задержки и запросы в секунду, включая бронирование под
+конкуренцией за одни и те же компьютеры. Результат сохраняется в JSON;
+два прогона сравнивает benchmarks/compare.py.
+
+    DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.run --output before.json
+    DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.run --skip-seed --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+
+import httpx
+from sqlalchemy import func, select
+from models.database import engine, SessionLocal
+from models.models import Booking
+from benchmarks.seed import seed
+from benchmarks.stats import percentile
+
+# Число компьютеров, за которые борются запросы сценария booking_contention
+CONTENTION_COMPUTERS = 5
+
+
+def scenarios(users: int, computers: int, bookings: int, horizon: datetime):
+    """Сценарии: имя -> функция, строящая (метод, путь, параметры, тело) для очередного запроса.
+
+    Новые бронирования создаются после horizon - конца последнего существующего
+    бронирования, поэтому повторный прогон на той же базе находит слоты свободными.
+    """
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    def future_slot(rng, days_from, days_to):
+        start = horizon + timedelta(days=rng.randint(days_from, days_to), hours=rng.randint(0, 23))
+        return {
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=rng.randint(1, 3))).isoformat()
+        }
+
+    return {
+        "computers_list": lambda rng: ("GET", "/computers/", None, None),
+        "computer_get": lambda rng: ("GET", f"/computers/{rng.randint(1, computers)}", None, None),
+        "availability": lambda rng: ("GET", "/computers/availability", {
+            "from": now.isoformat(), "to": (now + timedelta(days=1)).isoformat(), "step": 30
+        }, None),
+        "bookings_page": lambda rng: ("GET", "/bookings/", {
+            "limit": 100, "cursor": rng.randint(0, max(0, bookings - 100))
+        }, None),
+        "bookings_user": lambda rng: ("GET", f"/bookings/user/{rng.randint(1, users)}", {"limit": 50}, None),
+        "transactions_user": lambda rng: ("GET", f"/transactions/user/{rng.randint(1, users)}", {"limit": 50}, None),
+        "deposit": lambda rng: ("POST", "/transactions/deposit", {
+            "user_id": rng.randint(1, users), "amount": 100
+        }, None),
+        # Свободные слоты на год вперед: почти все запросы успешны
+        "booking_create": lambda rng: ("POST", "/bookings/", {"user_id": rng.randint(1, users)}, {
+            "computer_id": rng.randint(1, computers), **future_slot(rng, 31, 365)
+        }),
+        # Много запросов на несколько компьютеров в один день: большинство получает 400
+        "booking_contention": lambda rng: ("POST", "/bookings/", {"user_id": rng.randint(1, users)}, {
+            "computer_id": rng.randint(1, CONTENTION_COMPUTERS), **future_slot(rng, 30, 30)
+        }),
+        "reports_occupancy": lambda rng: ("GET", "/reports/occupancy/summary", {
+            "from": (now - timedelta(days=30)).isoformat(), "to": now.isoformat()
+        }, None),
+    }
+
+
+async def run_scenario(http: httpx.AsyncClient, build, requests: int, concurrency: int, random_seed: int) -> dict:
+    """Выполнить запросы сценария с заданной конкурентностью и посчитать статистику"""
+    rng = random.Random(random_seed)
+    plan = iter([build(rng) for _ in range(requests)])
+    latencies = []
+    statuses = {}
+
+    async def worker():
+        for method, path, params, body in plan:
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, path, params=params, json=body)
+                status = str(response.status_code)
+            except Exception:
+                # ASGITransport пробрасывает необработанные ошибки сервера
+                status = "error"
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "statuses": statuses,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args):
+    from main import app
+    from services.booking_index import booking_index
+    from services.rollups import backfill
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(engine, users=args.users, computers=args.computers, bookings=args.bookings)
+        async with SessionLocal() as db:
+            await backfill(db)
+        print(f"seed: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    # То же, что делает startup приложения, без бота и фоновых задач
+    async with SessionLocal() as db:
+        await booking_index.load(db)
+        horizon = await db.scalar(select(func.max(Booking.end_time)))
+    horizon = max(horizon or datetime.utcnow(), datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+    selected = scenarios(args.users, args.computers, args.bookings, horizon + timedelta(days=1))
+    if args.scenario:
+        unknown = set(args.scenario) - set(selected)
+        if unknown:
+            raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+        selected = {name: build for name, build in selected.items() if name in args.scenario}
+
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for index, (name, build) in enumerate(selected.items()):
+            results[name] = await run_scenario(http, build, args.requests, args.concurrency, random_seed=index)
+            stats = results[name]
+            print(
+                f"{name:20} {stats['rps']:8.0f} req/s  p50 {stats['p50_ms']:7.1f}  p95 {stats['p95_ms']:7.1f}  "
+                f"p99 {stats['p99_ms']:7.1f} ms  {stats['statuses']}",
+                file=sys.stderr
+            )
+    await engine.dispose()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "users": args.users,
+            "computers": args.computers,
+            "bookings": args.bookings,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--computers", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=1000000)
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже наполненную базу тех же размеров")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenario", action="append", help="запустить только указанные сценарии")
+    parser.add_argument("--output", default="benchmark.json")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Наполнение базы реалистичным набором данных для бенчмарков и проверки планов запросов"""
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, text
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from models.database import Base
+from models.models import User, Computer, Booking, Transaction, UserRole, ComputerStatus
+
+BATCH_SIZE = 10000
+# seed() удаляет все таблицы: он работает только с базами, в имени которых есть одно из этих слов
+SCRATCH_MARKERS = ("bench", "stress", "scratch", "test")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _is_scratch(url: URL) -> bool:
+    database = os.path.basename(url.database or "")
+    if url.get_backend_name() == "sqlite" and database in ("", ":memory:"):
+        return True
+    return any(marker in database.lower() for marker in SCRATCH_MARKERS)
+
+
+def _upgrade(connection):
+    """Создать схему миграциями alembic, как в рабочей базе, а не через create_all"""
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+async def _insert_batches(engine: AsyncEngine, table, rows):
+    """Вставить строки пачками, не держа весь набор в памяти"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            async with engine.begin() as conn:
+                await conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), batch)
+
+
+def _bookings(rng: random.Random, users: int, computers: int, bookings: int, now: datetime):
+    """Непересекающиеся бронирования по каждому компьютеру: большая часть в прошлом, хвост в будущем"""
+    per_computer = max(1, bookings // computers)
+    future = max(1, per_computer // 50)
+    booking_id = 0
+    for computer_id in range(1, computers + 1):
+        cursor = now - timedelta(hours=3 * (per_computer - future))
+        for i in range(per_computer):
+            cursor += timedelta(minutes=rng.choice((0, 15, 30, 60)))
+            end = cursor + timedelta(hours=rng.randint(1, 3))
+            if i >= per_computer - future:
+                status = "active"
+            else:
+                status = "cancelled" if rng.random() < 0.05 else "completed"
+            booking_id += 1
+            yield {
+                "id": booking_id,
+                "user_id": rng.randint(1, users),
+                "computer_id": computer_id,
+                "start_time": cursor,
+                "end_time": end,
+                "status": status,
+                "created_at": cursor - timedelta(hours=rng.randint(1, 48))
+            }
+            cursor = end
+
+
+def _transactions(rng: random.Random, users: int, transactions: int, now: datetime):
+    """Пополнения и списания пользователей за последний год"""
+    for transaction_id in range(1, transactions + 1):
+        deposit = rng.random() < 0.3
+        amount = round(rng.uniform(100, 2000), 2)
+        yield {
+            "id": transaction_id,
+            "user_id": rng.randint(1, users),
+            "amount": amount if deposit else -amount,
+            "type": "deposit" if deposit else "booking",
+            "description": "Пополнение баланса" if deposit else "Бронирование",
+            "created_at": now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        }
+
+
+async def seed(
+    engine: AsyncEngine,
+    users: int = 10000,
+    computers: int = 200,
+    bookings: int = 1000000,
+    transactions: int = 0,
+    random_seed: int = 42
+):
+    """Пересоздать схему миграциями и заполнить ее данными"""
+    # DATABASE_URL из окружения может указывать на рабочую базу: ее не пересоздаем
+    if not _is_scratch(engine.url):
+        raise RuntimeError(
+            f"Отказ пересоздавать базу {engine.url.render_as_string(hide_password=True)}: "
+            f"в имени базы бенчмарка должно быть одно из слов {', '.join(SCRATCH_MARKERS)}"
+        )
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        await conn.run_sync(_upgrade)
+
+    await _insert_batches(engine, User.__table__, (
+        {
+            "id": user_id,
+            "telegram_id": 100000 + user_id,
+            "username": f"user{user_id}",
+            "full_name": f"User {user_id}",
+            "role": UserRole.ADMIN if user_id == 1 else UserRole.USER,
+            "balance": 1000000.0,
+            "created_at": now
+        }
+        for user_id in range(1, users + 1)
+    ))
+    await _insert_batches(engine, Computer.__table__, (
+        {
+            "id": computer_id,
+            "name": f"PC-{computer_id:03d}",
+            "status": ComputerStatus.AVAILABLE,
+            "specs": "RTX 4070, Ryzen 7 7800X3D, 32GB",
+            "hourly_rate": float(rng.choice((150, 200, 300)))
+        }
+        for computer_id in range(1, computers + 1)
+    ))
+    await _insert_batches(engine, Booking.__table__, _bookings(rng, users, computers, bookings, now))
+    await _insert_batches(engine, Transaction.__table__, _transactions(rng, users, transactions or bookings, now))
+
+    # Обновляем статистику, чтобы планировщик видел реальные объемы
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # id вставлены явно: сдвигаем последовательности, чтобы вставки через API не конфликтовали
+            for table in (User.__table__, Computer.__table__, Booking.__table__, Transaction.__table__):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+                ))
+        await conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--computers", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=1000000)
+    parser.add_argument("--transactions", type=int, default=0, help="по умолчанию столько же, сколько бронирований")
+    args = parser.parse_args()
+
+    async def run():
+        engine = create_async_engine(args.url)
+        try:
+            await seed(engine, args.users, args.computers, args.bookings, args.transactions)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
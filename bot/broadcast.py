@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from telegram import Bot
+from telegram.error import Forbidden, BadRequest, RetryAfter, NetworkError
+from sqlalchemy import select, update, or_
+from models.database import SessionLocal
+from models.models import Broadcast, User
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: около 30 сообщений в секунду суммарно и 1 сообщение в секунду в один чат
+GLOBAL_RATE = 25.0
+PER_CHAT_INTERVAL = 1.0
+# Рассылку выполняет процесс, владеющий арендой; аренда продлевается, пока он жив
+LEASE_SECONDS = 60.0
+
+
+class TokenBucket:
+    """Ограничитель частоты по алгоритму маркерной корзины"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Приостановить выдачу маркеров (ответ Telegram о флуде)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Broadcaster:
+    """Рассылка сообщений всем пользователям с ограничением частоты и контрольными точками"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = GLOBAL_RATE,
+        chunk_size: int = 500,
+        concurrency: int = 10,
+        max_retries: int = 3,
+        lease_seconds: float = LEASE_SECONDS
+    ):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.lease = timedelta(seconds=lease_seconds)
+        # Уникален для каждого запуска: после рестарта процесс ждет истечения своей старой аренды
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._last_sent: Dict[int, float] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Периодически подхватывать рассылки с истекшей арендой"""
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def create(self, text: str) -> int:
+        """Создать задание на рассылку"""
+        async with SessionLocal() as db:
+            broadcast = Broadcast(text=text, status="pending", last_user_id=0, sent=0, failed=0)
+            db.add(broadcast)
+            await db.commit()
+            return broadcast.id
+
+    async def run(self, broadcast_id: int):
+        """Выполнить рассылку, продолжая с последней контрольной точки.
+
+        Рассылку захватывает один процесс: аренда (owner, lease_until) берется условным
+        UPDATE и продлевается в фоне. Контрольная точка сохраняется после каждой пачки,
+        поэтому после сбоя повторно может быть отправлена не более чем одна пачка.
+        """
+        async with SessionLocal() as db:
+            claimed = await self._claim(db, broadcast_id)
+            if claimed is None:
+                return
+            text, last_user_id, sent, failed = claimed
+
+            renewal = asyncio.create_task(self._renew_lease(broadcast_id))
+            try:
+                while True:
+                    recipients = await self._next_chunk(db, last_user_id)
+                    if not recipients:
+                        break
+
+                    semaphore = asyncio.Semaphore(self.concurrency)
+
+                    async def send(chat_id: int) -> bool:
+                        async with semaphore:
+                            return await self._send(chat_id, text)
+
+                    results = await asyncio.gather(*(send(chat_id) for _, chat_id in recipients))
+                    self._last_sent.clear()
+
+                    last_user_id = recipients[-1][0]
+                    sent += sum(results)
+                    failed += len(results) - sum(results)
+                    if not await self._save(db, broadcast_id, last_user_id=last_user_id, sent=sent, failed=failed):
+                        logger.warning("Рассылка %s перехвачена другим процессом после истечения аренды", broadcast_id)
+                        return
+
+                await self._save(db, broadcast_id, status="completed", owner=None, lease_until=None)
+                logger.info("Рассылка %s завершена: отправлено %s, ошибок %s", broadcast_id, sent, failed)
+            finally:
+                renewal.cancel()
+                await asyncio.gather(renewal, return_exceptions=True)
+
+    async def resume_pending(self):
+        """Продолжить рассылки, владелец которых перестал продлевать аренду"""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(Broadcast.id).filter(
+                    Broadcast.status.in_(("pending", "running")),
+                    or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < datetime.utcnow())
+                ).order_by(Broadcast.id)
+            )
+            broadcast_ids = result.scalars().all()
+        for broadcast_id in broadcast_ids:
+            await self.run(broadcast_id)
+
+    async def _watch(self):
+        while True:
+            try:
+                await self.resume_pending()
+            except Exception:
+                logger.exception("Ошибка при возобновлении рассылок")
+            await asyncio.sleep(self.lease.total_seconds())
+
+    async def _claim(self, db, broadcast_id: int) -> Optional[Tuple[str, int, int, int]]:
+        """Захватить аренду рассылки; None, если она завершена или ее ведет другой процесс"""
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast_id,
+                Broadcast.status != "completed",
+                or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < now)
+            )
+            .values(status="running", owner=self.owner, lease_until=now + self.lease, updated_at=now)
+            .returning(Broadcast.text, Broadcast.last_user_id, Broadcast.sent, Broadcast.failed)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.one_or_none()
+        await db.commit()
+        return tuple(claimed) if claimed is not None else None
+
+    async def _save(self, db, broadcast_id: int, **values) -> bool:
+        """Сохранить прогресс и продлить аренду; False, если аренда уже у другого процесса"""
+        now = datetime.utcnow()
+        values.setdefault("lease_until", now + self.lease)
+        result = await db.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.owner == self.owner)
+            .values(updated_at=now, **values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    async def _renew_lease(self, broadcast_id: int):
+        """Продлевать аренду, пока идет рассылка: пачка может отправляться дольше аренды"""
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                async with SessionLocal() as db:
+                    if not await self._save(db, broadcast_id):
+                        return
+            except Exception:
+                logger.exception("Не удалось продлить аренду рассылки %s", broadcast_id)
+
+    async def _next_chunk(self, db, last_user_id: int) -> List[Tuple[int, int]]:
+        result = await db.execute(
+            select(User.id, User.telegram_id).filter(
+                User.id > last_user_id,
+                User.telegram_id.isnot(None)
+            ).order_by(User.id).limit(self.chunk_size)
+        )
+        return result.all()
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            # Не чаще одного сообщения в секунду в один чат
+            wait = self._last_sent.get(chat_id, 0.0) + PER_CHAT_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.bucket.acquire()
+            self._last_sent[chat_id] = time.monotonic()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                self.bucket.pause(retry_after)
+            except (Forbidden, BadRequest):
+                # Пользователь заблокировал бота или чат недоступен
+                return False
+            except NetworkError:
+                await asyncio.sleep(2 ** attempt)
+        return False
@@ -2,31 +2,37 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppI
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 import os
 from dotenv import load_dotenv
-from ..models.database import SessionLocal
-from ..models.models import User, UserRole
+from models.database import SessionLocal
+from models.models import User, UserRole
+from services.metrics import timed_handler
+from services.user_cache import balance_channel, telegram_users
+from bot.broadcast import Broadcaster
 from sqlalchemy import select
 
 load_dotenv()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
-    # Проверяем, зарегистрирован ли пользователь
-    async with SessionLocal() as db:
-        result = await db.execute(
-            select(User).filter(User.telegram_id == update.effective_user.id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            # Создаем нового пользователя
-            user = User(
-                telegram_id=update.effective_user.id,
-                username=update.effective_user.username,
-                full_name=update.effective_user.full_name,
-                role=UserRole.USER
+    # Проверяем, зарегистрирован ли пользователь (известных берем из кэша)
+    if telegram_users.get(update.effective_user.id) is None:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(User).filter(User.telegram_id == update.effective_user.id)
             )
-            db.add(user)
-            await db.commit()
+            user = result.scalar_one_or_none()
+            
+            if not user:
+                # Создаем нового пользователя
+                user = User(
+                    telegram_id=update.effective_user.id,
+                    username=update.effective_user.username,
+                    full_name=update.effective_user.full_name,
+                    role=UserRole.USER
+                )
+                db.add(user)
+                await db.commit()
+            
+            telegram_users.put(user.telegram_id, user.id, user.balance)
     
     # Создаем кнопки с веб-приложением
     keyboard = [
@@ -56,28 +62,75 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /balance"""
-    async with SessionLocal() as db:
-        result = await db.execute(
-            select(User).filter(User.telegram_id == update.effective_user.id)
-        )
-        user = result.scalar_one_or_none()
-        
-        if user:
-            await update.message.reply_text(
-                f"Ваш текущий баланс: {user.balance:.2f} руб."
+    cached = telegram_users.get(update.effective_user.id)
+    if cached is None:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(User).filter(User.telegram_id == update.effective_user.id)
             )
-        else:
+            user = result.scalar_one_or_none()
+        
+        if not user:
             await update.message.reply_text(
                 "Пользователь не найден. Используйте /start для регистрации."
             )
+            return
+        cached = telegram_users.put(user.telegram_id, user.id, user.balance)
+    
+    await update.message.reply_text(
+        f"Ваш текущий баланс: {cached.balance:.2f} руб."
+    )
+
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /broadcast <текст> (только для администраторов)"""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(User.role).filter(User.telegram_id == update.effective_user.id)
+        )
+        role = result.scalar_one_or_none()
+    
+    if role != UserRole.ADMIN:
+        await update.message.reply_text("Команда доступна только администраторам.")
+        return
+    
+    text = " ".join(context.args)
+    if not text:
+        await update.message.reply_text("Использование: /broadcast <текст сообщения>")
+        return
+    
+    broadcaster = context.application.bot_data["broadcaster"]
+    broadcast_id = await broadcaster.create(text)
+    context.application.create_task(broadcaster.run(broadcast_id))
+    await update.message.reply_text(f"Рассылка #{broadcast_id} запущена.")
+
+async def post_init(application: Application):
+    """Продолжить прерванные рассылки и подписаться на сброс кэша балансов после запуска бота"""
+    broadcaster = Broadcaster(application.bot)
+    application.bot_data["broadcaster"] = broadcaster
+    broadcaster.start()
+    if balance_channel is not None:
+        balance_channel.start()
+
+async def post_shutdown(application: Application):
+    """Остановить фоновое возобновление рассылок и подписку на сброс кэша"""
+    broadcaster = application.bot_data.get("broadcaster")
+    if broadcaster is not None:
+        await broadcaster.stop()
+    if balance_channel is not None:
+        await balance_channel.stop()
 
 def create_application():
     """Создание и настройка приложения бота"""
-    application = Application.builder().token(os.getenv("TELEGRAM_BOT_TOKEN")).build()
+    builder = Application.builder().token(os.getenv("TELEGRAM_BOT_TOKEN")).post_init(post_init).post_shutdown(post_shutdown)
+    # Адрес Bot API можно переопределить, например, локальным фейковым сервером
+    if os.getenv("TELEGRAM_API_BASE_URL"):
+        builder = builder.base_url(os.getenv("TELEGRAM_API_BASE_URL"))
+    application = builder.build()
     
     # Регистрация обработчиков команд
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("balance", balance))
+    application.add_handler(CommandHandler("start", timed_handler(start)))
+    application.add_handler(CommandHandler("help", timed_handler(help_command)))
+    application.add_handler(CommandHandler("balance", timed_handler(balance)))
+    application.add_handler(CommandHandler("broadcast", timed_handler(broadcast)))
     
     return application 
\ No newline at end of file
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import List, Optional
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookProcessor:
+    """Прием обновлений Telegram через вебхук с ограниченной очередью и пулом обработчиков"""
+
+    def __init__(self, application: Application, workers: int = 8, queue_size: int = 1000):
+        self.application = application
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, webhook_url: Optional[str] = None, secret_token: Optional[str] = None):
+        """Инициализировать бота, зарегистрировать вебхук и запустить обработчики"""
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        await self.application.start()
+        if webhook_url:
+            await self.application.bot.set_webhook(url=webhook_url, secret_token=secret_token)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Дождаться обработки очереди и остановить бота"""
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.application.stop()
+        await self.application.shutdown()
+        if self.application.post_shutdown:
+            await self.application.post_shutdown(self.application)
+
+    def parse(self, data) -> Optional[Update]:
+        """Разобрать тело запроса Telegram; None, если это не обновление"""
+        if not isinstance(data, dict):
+            return None
+        try:
+            return Update.de_json(data, self.application.bot)
+        except Exception:
+            # de_json не проверяет типы полей и падает на чем угодно
+            logger.warning("Не удалось разобрать обновление Telegram", exc_info=True)
+            return None
+
+    def submit(self, update: Update) -> bool:
+        """Поставить обновление в очередь; False, если очередь переполнена"""
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.application.process_update(update)
+            except Exception:
+                logger.exception("Ошибка обработки обновления %s", update.update_id)
+            finally:
+                self.queue.task_done()
@@ -1,10 +1,21 @@
 import asyncio
+import logging
+import os
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from bot.telegram_bot import create_application
-from routers import computers, bookings, transactions, users
-from models.database import engine, Base
+from bot.webhook import WebhookProcessor
+from routers import computers, bookings, transactions, users, telegram, reports
+from models.database import engine, read_engine, Base, SessionLocal
+from services.booking_index import booking_index, run_pruning
+from services.booking_scheduler import booking_scheduler
+from services.ledger import run_reconciliation
+from services.rollups import check_dialect, run_folding
+from services.metrics import MetricsMiddleware, instrument_engine, registry, CONTENT_TYPE
+from services.profiling import ProfilingMiddleware, profiling_available
+
+logger = logging.getLogger(__name__)
 
 # Создаем FastAPI приложение
 app = FastAPI(
@@ -20,23 +31,94 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Курсор следующей страницы должен быть доступен скрипту веб-приложения
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Профилирование отдельных запросов по секретному токену (без токена middleware не подключается)
+if os.getenv("PROFILING_TOKEN"):
+    if profiling_available():
+        app.add_middleware(ProfilingMiddleware, token=os.getenv("PROFILING_TOKEN"))
+    else:
+        logger.warning("PROFILING_TOKEN задан, но pyinstrument не установлен: профилирование отключено")
+
+# Метрики: время и статусы запросов, SQL-запросы на запрос, пул соединений
+app.add_middleware(MetricsMiddleware)
+# Журнал запросов дольше SLOW_QUERY_MS миллисекунд (0 - выключен)
+slow_query_ms = float(os.getenv("SLOW_QUERY_MS", "0"))
+instrument_engine(engine, "primary", slow_query_ms)
+if read_engine is not engine:
+    instrument_engine(read_engine, "replica", slow_query_ms)
+
 # Подключаем роутеры
 app.include_router(users.router)
 app.include_router(computers.router)
 app.include_router(bookings.router)
 app.include_router(transactions.router)
+app.include_router(telegram.router)
+app.include_router(reports.router)
 
 @app.on_event("startup")
 async def startup():
+    # Агрегатам нужен INSERT ... ON CONFLICT: неподдерживаемая база видна сразу, а не на первой записи
+    check_dialect(engine)
+
     # Создаем таблицы в базе данных
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+    # Загружаем индекс занятости компьютеров и таймеры бронирований
+    async with SessionLocal() as db:
+        await booking_index.load(db)
+        await booking_scheduler.load(db)
+    booking_scheduler.start()
+    # Закончившиеся бронирования других воркеров убираются из индекса по таймеру
+    prune_interval = float(os.getenv("BOOKING_INDEX_PRUNE_INTERVAL", "300"))
+    if prune_interval > 0:
+        asyncio.create_task(run_pruning(prune_interval))
+
+    # Периодическая сверка балансов с журналом транзакций
+    reconcile_interval = float(os.getenv("LEDGER_RECONCILE_INTERVAL", "0"))
+    if reconcile_interval > 0:
+        asyncio.create_task(run_reconciliation(reconcile_interval))
     
-    # Запускаем бота
+    # Свертка журнала загрузки и новых транзакций в агрегаты отчетов
+    fold_interval = float(os.getenv("ROLLUP_FOLD_INTERVAL", "60"))
+    if fold_interval > 0:
+        asyncio.create_task(run_folding(fold_interval))
+
+    # Запускаем бота: вебхук или опрос серверов Telegram как запасной вариант
     bot_app = create_application()
-    asyncio.create_task(bot_app.run_polling())
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        processor = WebhookProcessor(
+            bot_app,
+            workers=int(os.getenv("BOT_WEBHOOK_WORKERS", "8")),
+            queue_size=int(os.getenv("BOT_WEBHOOK_QUEUE_SIZE", "1000"))
+        )
+        await processor.start(os.getenv("WEBHOOK_URL"), os.getenv("WEBHOOK_SECRET"))
+        app.state.bot_webhook = processor
+    else:
+        # run_polling() управляет своим event loop и не подходит для запуска внутри uvicorn
+        await bot_app.initialize()
+        if bot_app.post_init:
+            await bot_app.post_init(bot_app)
+        await bot_app.start()
+        await bot_app.updater.start_polling()
+        app.state.bot_polling = bot_app
+
+@app.on_event("shutdown")
+async def shutdown():
+    await booking_scheduler.stop()
+    processor = getattr(app.state, "bot_webhook", None)
+    if processor is not None:
+        await processor.stop()
+    bot_app = getattr(app.state, "bot_polling", None)
+    if bot_app is not None:
+        await bot_app.updater.stop()
+        await bot_app.stop()
+        await bot_app.shutdown()
+        if bot_app.post_shutdown:
+            await bot_app.post_shutdown(bot_app)
 
 @app.get("/")
 async def root():
@@ -46,5 +128,10 @@ async def root():
         "redoc_url": "/redoc"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
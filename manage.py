@@ -0,0 +1,134 @@
+"""Служебные команды обслуживания базы.
+
+    python manage.py backfill-rollups
+    python manage.py export-transactions --format csv --output transactions.csv --from 2026-09-01 --to 2026-10-01
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from models.database import engine, Base, SessionLocal
+from services.export import EXPORT_FORMATS, export_query, iter_chunks, csv_chunk, ParquetChunkWriter
+from services.rollups import backfill
+
+
+async def backfill_rollups(args):
+    """Пересобрать агрегаты загрузки и выручки из сырых таблиц"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        report = await backfill(db)
+    print(f"Загрузка: {report['occupancy_rows']} строк, выручка: {report['revenue_rows']} строк")
+
+
+def _save_progress(output: str, offset: int, last_id):
+    """Атомарно записать, до какого байта файл выгрузки цел и каким id он заканчивается"""
+    path = output + ".progress"
+    with open(path + ".tmp", "w", encoding="utf-8") as progress:
+        json.dump({"offset": offset, "last_id": last_id}, progress)
+        progress.flush()
+        os.fsync(progress.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _resume_offset(output: str, after_id: int) -> int:
+    """Проверить точку продолжения CSV по файлу прогресса и вернуть длину целой части файла"""
+    try:
+        with open(output + ".progress", encoding="utf-8") as progress:
+            state = json.load(progress)
+    except FileNotFoundError:
+        sys.exit(f"Нет файла {output}.progress: продолжить выгрузку в {output} нельзя, начните ее заново")
+    if state["last_id"] is None:
+        sys.exit(f"В {output} еще нет строк, запустите выгрузку без --after-id")
+    if state["last_id"] != after_id:
+        sys.exit(f"{output} выгружен до id {state['last_id']}, продолжите с --after-id {state['last_id']}")
+    return state["offset"]
+
+
+def _parquet_output(output: str, after_id) -> str:
+    """Parquet нельзя дописать: продолжение пишется в отдельный файл рядом с исходным"""
+    if after_id is None:
+        return output
+    root, ext = os.path.splitext(output)
+    path = f"{root}.after-{after_id}{ext or '.parquet'}"
+    if os.path.exists(path):
+        sys.exit(f"{path} уже существует")
+    return path
+
+
+async def export_transactions(args):
+    """Выгрузить транзакции в CSV или Parquet с постоянным расходом памяти"""
+    query = export_query(args.start, args.end, args.type, args.after_id)
+    if args.format == "csv":
+        # При продолжении отрезаем недописанную пачку и дописываем без повторного заголовка
+        append = args.after_id is not None and os.path.exists(args.output)
+        offset = _resume_offset(args.output, args.after_id) if append else 0
+    else:
+        path = _parquet_output(args.output, args.after_id)
+    last_id = args.after_id
+    exported = 0
+    try:
+        async with SessionLocal() as db:
+            if args.format == "csv":
+                with open(args.output, "r+b" if append else "wb") as output:
+                    if append:
+                        output.truncate(offset)
+                        output.seek(offset)
+                    else:
+                        output.write(csv_chunk([], header=True).encode("utf-8"))
+                        _save_progress(args.output, output.tell(), last_id)
+                    async for rows in iter_chunks(db, query):
+                        output.write(csv_chunk(rows).encode("utf-8"))
+                        output.flush()
+                        os.fsync(output.fileno())
+                        # Прогресс фиксируется только после того, как пачка целиком на диске
+                        last_id = rows[-1][0]
+                        exported += len(rows)
+                        _save_progress(args.output, output.tell(), last_id)
+            else:
+                with open(path, "wb") as output:
+                    writer = ParquetChunkWriter(output)
+                    try:
+                        async for rows in iter_chunks(db, query):
+                            writer.write(rows)
+                            last_id = rows[-1][0]
+                            exported += len(rows)
+                    finally:
+                        # Закрываем файл корректно, чтобы записанные группы строк остались читаемыми
+                        writer.close()
+                print(f"Файл: {path}", file=sys.stderr)
+    finally:
+        print(f"Выгружено строк: {exported}, последний id: {last_id}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = commands.add_parser("backfill-rollups", help=backfill_rollups.__doc__)
+    backfill_parser.set_defaults(handler=backfill_rollups)
+
+    export_parser = commands.add_parser("export-transactions", help=export_transactions.__doc__)
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    export_parser.add_argument("--output", required=True)
+    export_parser.add_argument("--from", dest="start", type=datetime.fromisoformat)
+    export_parser.add_argument("--to", dest="end", type=datetime.fromisoformat)
+    export_parser.add_argument("--type", help="deposit, withdrawal, booking или refund")
+    export_parser.add_argument("--after-id", type=int, help="продолжить после последнего выгруженного id")
+    export_parser.set_defaults(handler=export_transactions)
+
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await args.handler(args)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""initial schema: users, computers, bookings, transactions
+
+Revision ID: 0000_initial_schema
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0000_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Базы, созданные через create_all при старте приложения, уже содержат эти таблицы
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'users' not in tables:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('telegram_id', sa.Integer(), nullable=True),
+            sa.Column('username', sa.String(), nullable=True),
+            sa.Column('full_name', sa.String(), nullable=True),
+            sa.Column('role', sa.Enum('ADMIN', 'USER', name='userrole'), nullable=True),
+            sa.Column('balance', sa.Float(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_telegram_id', 'users', ['telegram_id'], unique=True)
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    if 'computers' not in tables:
+        op.create_table(
+            'computers',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=True, unique=True),
+            sa.Column('status', sa.Enum('AVAILABLE', 'OCCUPIED', 'MAINTENANCE', name='computerstatus'), nullable=True),
+            sa.Column('specs', sa.String(), nullable=True),
+            sa.Column('hourly_rate', sa.Float(), nullable=True),
+        )
+        op.create_index('ix_computers_id', 'computers', ['id'])
+    if 'bookings' not in tables:
+        op.create_table(
+            'bookings',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('computer_id', sa.Integer(), sa.ForeignKey('computers.id'), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=True),
+            sa.Column('end_time', sa.DateTime(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_bookings_id', 'bookings', ['id'])
+    if 'transactions' not in tables:
+        op.create_table(
+            'transactions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('amount', sa.Float(), nullable=True),
+            sa.Column('type', sa.String(), nullable=True),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_transactions_id', 'transactions', ['id'])
+
+
+def downgrade() -> None:
+    # upgrade создает таблицы, только если их нет, поэтому и удаляем лишь существующие
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in ('transactions', 'bookings', 'computers', 'users'):
+        if table in tables:
+            op.drop_table(table)
+    sa.Enum(name='computerstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='userrole').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,39 @@
+"""performance indexes for bookings and transactions
+
+Revision ID: 0001_performance_indexes
+Revises: 0000_initial_schema
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_performance_indexes'
+down_revision = '0000_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_bookings_computer_status_time', 'bookings',
+        ['computer_id', 'status', 'start_time', 'end_time'],
+        if_not_exists=True
+    )
+    op.create_index(
+        'ix_bookings_active_end_time', 'bookings', ['end_time'],
+        postgresql_where=sa.text("status = 'active'"),
+        sqlite_where=sa.text("status = 'active'"),
+        if_not_exists=True
+    )
+    op.create_index('ix_bookings_user_id_id', 'bookings', ['user_id', 'id'], if_not_exists=True)
+    op.create_index('ix_transactions_user_id_id', 'transactions', ['user_id', 'id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_id_id', table_name='transactions')
+    op.drop_index('ix_bookings_user_id_id', table_name='bookings')
+    op.drop_index('ix_bookings_active_end_time', table_name='bookings')
+    op.drop_index('ix_bookings_computer_status_time', table_name='bookings')
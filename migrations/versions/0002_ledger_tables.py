@@ -0,0 +1,42 @@
+"""ledger checkpoint and per-user ledger totals
+
+Revision ID: 0002_ledger_tables
+Revises: 0001_performance_indexes
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_ledger_tables'
+down_revision = '0001_performance_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблицы могли уже появиться через create_all при старте приложения
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'ledger_checkpoints' not in tables:
+        op.create_table(
+            'ledger_checkpoints',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('last_transaction_id', sa.Integer(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+    if 'ledger_totals' not in tables:
+        op.create_table(
+            'ledger_totals',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('total', sa.Float(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    # upgrade создает таблицы, только если их нет, поэтому и удаляем лишь существующие
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in ('ledger_totals', 'ledger_checkpoints'):
+        if table in tables:
+            op.drop_table(table)
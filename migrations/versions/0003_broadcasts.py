@@ -0,0 +1,53 @@
+"""broadcasts table with a per-process lease
+
+Revision ID: 0003_broadcasts
+Revises: 0002_ledger_tables
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_broadcasts'
+down_revision = '0002_ledger_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # Таблица могла уже появиться через create_all при старте приложения, но без колонок аренды
+    if 'broadcasts' not in inspector.get_table_names():
+        op.create_table(
+            'broadcasts',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('text', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('last_user_id', sa.Integer(), nullable=True),
+            sa.Column('sent', sa.Integer(), nullable=True),
+            sa.Column('failed', sa.Integer(), nullable=True),
+            sa.Column('owner', sa.String(), nullable=True),
+            sa.Column('lease_until', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_broadcasts_id', 'broadcasts', ['id'])
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('broadcasts')}
+    if 'owner' not in columns:
+        op.add_column('broadcasts', sa.Column('owner', sa.String(), nullable=True))
+    if 'lease_until' not in columns:
+        op.add_column('broadcasts', sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    # Как и upgrade, не рассчитываем на то, что таблицу создала эта ревизия
+    inspector = sa.inspect(op.get_bind())
+    if 'broadcasts' not in inspector.get_table_names():
+        return
+    if 'ix_broadcasts_id' in {index['name'] for index in inspector.get_indexes('broadcasts')}:
+        op.drop_index('ix_broadcasts_id', table_name='broadcasts')
+    op.drop_table('broadcasts')
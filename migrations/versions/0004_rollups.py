@@ -0,0 +1,84 @@
+"""occupancy and revenue rollups with their journal, checkpoints and staging tables
+
+Revision ID: 0004_rollups
+Revises: 0003_broadcasts
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_rollups'
+down_revision = '0003_broadcasts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Таблицы могли уже появиться через create_all при старте приложения
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'computer_hour_occupancy' not in tables:
+        op.create_table(
+            'computer_hour_occupancy',
+            sa.Column('computer_id', sa.Integer(), sa.ForeignKey('computers.id'), primary_key=True),
+            sa.Column('hour', sa.DateTime(), primary_key=True),
+            sa.Column('booked_seconds', sa.Integer(), nullable=True),
+        )
+        op.create_index('ix_computer_hour_occupancy_hour', 'computer_hour_occupancy', ['hour'])
+    if 'daily_revenue' not in tables:
+        op.create_table(
+            'daily_revenue',
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('type', sa.String(), primary_key=True),
+            sa.Column('amount', sa.Float(), nullable=True),
+            sa.Column('count', sa.Integer(), nullable=True),
+        )
+    if 'occupancy_deltas' not in tables:
+        op.create_table(
+            'occupancy_deltas',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('computer_id', sa.Integer(), nullable=False),
+            sa.Column('hour', sa.DateTime(), nullable=False),
+            sa.Column('booked_seconds', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+    if 'rollup_checkpoints' not in tables:
+        op.create_table(
+            'rollup_checkpoints',
+            sa.Column('name', sa.String(), primary_key=True),
+            sa.Column('last_id', sa.Integer(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+    if 'computer_hour_occupancy_staging' not in tables:
+        op.create_table(
+            'computer_hour_occupancy_staging',
+            sa.Column('computer_id', sa.Integer(), primary_key=True),
+            sa.Column('hour', sa.DateTime(), primary_key=True),
+            sa.Column('booked_seconds', sa.Integer(), nullable=True),
+        )
+    if 'daily_revenue_staging' not in tables:
+        op.create_table(
+            'daily_revenue_staging',
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('type', sa.String(), primary_key=True),
+            sa.Column('amount', sa.Float(), nullable=True),
+            sa.Column('count', sa.Integer(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    # upgrade создает таблицы, только если их нет, поэтому и удаляем лишь существующие;
+    # индекс по часу удаляется вместе со своей таблицей
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in (
+        'daily_revenue_staging',
+        'computer_hour_occupancy_staging',
+        'rollup_checkpoints',
+        'occupancy_deltas',
+        'daily_revenue',
+        'computer_hour_occupancy',
+    ):
+        if table in tables:
+            op.drop_table(table)
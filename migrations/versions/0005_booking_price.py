@@ -0,0 +1,31 @@
+"""charged amount on bookings for exact refunds
+
+Revision ID: 0005_booking_price
+Revises: 0004_rollups
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_booking_price'
+down_revision = '0004_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('bookings')}
+    if 'price' not in columns:
+        op.add_column('bookings', sa.Column('price', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'bookings' not in inspector.get_table_names():
+        return
+    if 'price' in {column['name'] for column in inspector.get_columns('bookings')}:
+        with op.batch_alter_table('bookings') as batch:
+            batch.drop_column('price')
@@ -1,20 +1,121 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
+# Реплика только для чтения; без нее все запросы идут в основную базу
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+# После ошибки подключения к реплике столько секунд читаем из основной базы
+REPLICA_RETRY_INTERVAL = float(os.getenv("REPLICA_RETRY_INTERVAL", "30"))
+_replica_down_until = 0.0
+
+def _engine_options(url: str) -> dict:
+    """Настройки пула и драйвера из переменных окружения"""
+    parsed = make_url(url)
+    # У SQLite свой пул (NullPool/StaticPool) без этих параметров
+    if parsed.get_backend_name() == "sqlite":
+        return {}
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+    }
+    if parsed.get_driver_name() == "asyncpg":
+        # Кэши подготовленных выражений: драйвера asyncpg и адаптера SQLAlchemy.
+        # За PgBouncer в режиме транзакций оба нужно выставить в 0
+        options["connect_args"] = {
+            "statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+            "prepared_statement_cache_size": int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100")),
+        }
+    return options
+
+def _connection_lost(error: Exception) -> bool:
+    """Ошибка соединения с базой, а не ошибка самого запроса"""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return isinstance(error, OSError)
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+class ReadSession(AsyncSession):
+    """Сессия чтения с реплики: если соединение с репликой потеряно, запрос повторяется в основной базе.
+
+    Ошибка может случиться на любом запросе, а не только при открытии сессии:
+    реплику перезапустили или соединение из пула оказалось разорванным.
+    """
+
+    async def _with_fallback(self, method, *args, **kwargs):
+        global _replica_down_until
+        try:
+            return await method(*args, **kwargs)
+        except (DBAPIError, OSError) as error:
+            if self.bind is engine or not _connection_lost(error):
+                raise
+            logger.warning("Реплика недоступна, чтение идет из основной базы", exc_info=True)
+            _replica_down_until = time.monotonic() + REPLICA_RETRY_INTERVAL
+            await self.close()
+            self.bind = engine
+            self.sync_session.bind = engine.sync_engine
+            return await method(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._with_fallback(super().execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._with_fallback(super().scalar, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._with_fallback(super().get, *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        # Повторяется только открытие курсора; обрыв посреди чтения уходит вызывающему коду
+        return await self._with_fallback(super().stream, *args, **kwargs)
+
+if READ_DATABASE_URL:
+    read_engine = create_async_engine(READ_DATABASE_URL, **_engine_options(READ_DATABASE_URL))
+    ReadSessionLocal = sessionmaker(read_engine, class_=ReadSession, expire_on_commit=False)
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
 Base = declarative_base()
 
+# INSERT ... ON CONFLICT есть не во всех диалектах: сверка и агрегаты поддерживают эти
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def upsert(db: AsyncSession, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта сессии"""
+    return UPSERT_DIALECTS[db.bind.dialect.name](model)
+
 async def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        await db.close() 
\ No newline at end of file
+        await db.close()
+
+async def open_read_session() -> AsyncSession:
+    """Сессия для чтения: реплика, если она задана и не отказывала недавно, иначе основная база"""
+    if time.monotonic() < _replica_down_until:
+        return SessionLocal()
+    return ReadSessionLocal()
+
+async def get_read_db():
+    db = await open_read_session()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,6 +1,6 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Enum
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Date, Float, Enum, Index, text
 from sqlalchemy.orm import relationship
-from .database import Base
+from models.database import Base
 import enum
 from datetime import datetime
 
@@ -47,19 +47,119 @@ class Booking(Base):
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     status = Column(String)  # active, completed, cancelled
+    price = Column(Float)  # списанная сумма, ее же возвращает отмена
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="bookings")
     computer = relationship("Computer", back_populates="bookings")
 
+    __table_args__ = (
+        # Проверка пересечений при бронировании
+        Index("ix_bookings_computer_status_time", "computer_id", "status", "start_time", "end_time"),
+        # Сетка занятости и загрузка индекса: только активные бронирования
+        Index(
+            "ix_bookings_active_end_time", "end_time",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+        # История пользователя с постраничной выдачей по id
+        Index("ix_bookings_user_id_id", "user_id", "id"),
+    )
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     amount = Column(Float)
-    type = Column(String)  # deposit, withdrawal, booking
+    type = Column(String)  # deposit, withdrawal, booking, refund
     description = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="transactions") 
\ No newline at end of file
+    user = relationship("User", back_populates="transactions")
+
+    __table_args__ = (
+        # История пользователя с постраничной выдачей по id
+        Index("ix_transactions_user_id_id", "user_id", "id"),
+    )
+
+class Broadcast(Base):
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    text = Column(String)
+    status = Column(String, default="pending")  # pending, running, completed
+    last_user_id = Column(Integer, default=0)  # контрольная точка для продолжения после сбоя
+    sent = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    owner = Column(String, nullable=True)  # процесс, который ведет рассылку
+    lease_until = Column(DateTime, nullable=True)  # после этого момента рассылку может подхватить другой процесс
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class LedgerCheckpoint(Base):
+    __tablename__ = "ledger_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    last_transaction_id = Column(Integer, default=0)  # последняя учтенная сверкой транзакция
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class LedgerTotal(Base):
+    __tablename__ = "ledger_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Float, default=0.0)  # сумма всех учтенных транзакций пользователя
+
+class ComputerHourOccupancy(Base):
+    __tablename__ = "computer_hour_occupancy"
+
+    computer_id = Column(Integer, ForeignKey("computers.id"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # начало часа (UTC)
+    booked_seconds = Column(Integer, default=0)  # занятое активными бронированиями время внутри часа
+
+    __table_args__ = (
+        # Отчеты по всем компьютерам за интервал
+        Index("ix_computer_hour_occupancy_hour", "hour"),
+    )
+
+class DailyRevenue(Base):
+    __tablename__ = "daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)  # тип транзакции: deposit, withdrawal, booking, refund
+    amount = Column(Float, default=0.0)
+    count = Column(Integer, default=0)
+
+class OccupancyDelta(Base):
+    __tablename__ = "occupancy_deltas"
+
+    # Журнал изменений загрузки: бронирования только дописывают строки, без обновления общих агрегатов.
+    # Фоновая свертка переносит строки в computer_hour_occupancy и удаляет их
+    id = Column(Integer, primary_key=True)
+    computer_id = Column(Integer, nullable=False)
+    hour = Column(DateTime, nullable=False)
+    booked_seconds = Column(Integer, nullable=False)  # отрицательное при отмене
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RollupCheckpoint(Base):
+    __tablename__ = "rollup_checkpoints"
+
+    name = Column(String, primary_key=True)  # occupancy или revenue
+    last_id = Column(Integer, default=0)  # последняя свернутая строка occupancy_deltas или transactions
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Пересборка агрегатов идет в эти таблицы, затем они подменяют основные одной транзакцией
+class ComputerHourOccupancyStaging(Base):
+    __tablename__ = "computer_hour_occupancy_staging"
+
+    computer_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    booked_seconds = Column(Integer, default=0)
+
+class DailyRevenueStaging(Base):
+    __tablename__ = "daily_revenue_staging"
+
+    day = Column(Date, primary_key=True)
+    type = Column(String, primary_key=True)
+    amount = Column(Float, default=0.0)
+    count = Column(Integer, default=0)
@@ -1,79 +1,284 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from ..models.database import get_db
-from ..models.models import Booking, Computer, User
-from ..schemas.schemas import Booking as BookingSchema
-from ..schemas.schemas import BookingCreate
-from sqlalchemy import select
+from typing import List, Optional
+from models.database import get_db, get_read_db
+from models.models import Booking, Computer, User
+from schemas.schemas import Booking as BookingSchema
+from schemas.schemas import BookingCreate, BookingBatchCreate
+from schemas.schemas import SlotHold as SlotHoldSchema
+from services.booking_index import booking_index
+from services.booking_scheduler import booking_scheduler
+from services.slot_holds import slot_holds
+from services.locks import computer_locks
+from services.pagination import paginate, stream_ndjson
+from services.ledger import apply_balance_change
+from services.rollups import record_bookings
+from sqlalchemy import Select, select, update, and_, or_
 from datetime import datetime
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
+def user_bookings_query(user_id: int) -> Select:
+    return select(Booking).filter(Booking.user_id == user_id)
+
+def overlap_query(computer_id: int, start_time: datetime, end_time: datetime) -> Select:
+    """Активное бронирование компьютера, пересекающее интервал"""
+    return select(Booking).filter(
+        Booking.computer_id == computer_id,
+        Booking.status == "active",
+        Booking.start_time < end_time,
+        Booking.end_time > start_time
+    ).limit(1)
+
 @router.get("/", response_model=List[BookingSchema])
-async def get_bookings(db: AsyncSession = Depends(get_db)):
-    """Получить список всех бронирований"""
-    result = await db.execute(select(Booking))
-    bookings = result.scalars().all()
-    return bookings
+async def get_bookings(
+    response: Response,
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[int] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить список бронирований постранично или потоком NDJSON"""
+    query = select(Booking)
+    if stream:
+        return stream_ndjson(query, Booking, BookingSchema, cursor)
+    return await paginate(db, query, Booking, response, limit, cursor)
+
+@router.get("/index/check")
+async def check_booking_index(db: AsyncSession = Depends(get_db)):
+    """Сверить индекс занятости с таблицей бронирований"""
+    # Индекс отражает основную базу: сверка с репликой давала бы ложные расхождения
+    return await booking_index.check_consistency(db)
 
 @router.get("/user/{user_id}", response_model=List[BookingSchema])
-async def get_user_bookings(user_id: int, db: AsyncSession = Depends(get_db)):
+async def get_user_bookings(
+    user_id: int,
+    response: Response,
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[int] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
     """Получить бронирования конкретного пользователя"""
-    result = await db.execute(select(Booking).filter(Booking.user_id == user_id))
-    bookings = result.scalars().all()
-    return bookings
+    query = user_bookings_query(user_id)
+    if stream:
+        return stream_ndjson(query, Booking, BookingSchema, cursor)
+    return await paginate(db, query, Booking, response, limit, cursor)
 
-@router.post("/", response_model=BookingSchema)
-async def create_booking(booking: BookingCreate, user_id: int, db: AsyncSession = Depends(get_db)):
-    """Создать новое бронирование"""
-    # Проверяем доступность компьютера
+def _check_interval(booking: BookingCreate):
+    """Пустой или перевернутый интервал дал бы нулевую или отрицательную стоимость"""
+    if booking.end_time <= booking.start_time:
+        raise HTTPException(status_code=400, detail="Время окончания должно быть позже начала")
+
+async def _index_conflict(db: AsyncSession, computer_id: int, start_time: datetime, end_time: datetime) -> bool:
+    """Подтвердить в базе занятость по индексу; устаревшие записи индекса удаляются"""
+    if not booking_index.loaded:
+        return False
+    indexed = booking_index.overlapping(computer_id, start_time, end_time)
+    if not indexed:
+        return False
+    # Индекс не знает об отменах и завершениях в других воркерах
     result = await db.execute(
-        select(Booking).filter(
-            Booking.computer_id == booking.computer_id,
+        select(Booking.id).filter(
+            Booking.id.in_(indexed),
             Booking.status == "active",
-            Booking.start_time < booking.end_time,
-            Booking.end_time > booking.start_time
+            Booking.start_time < end_time,
+            Booking.end_time > start_time
         )
     )
-    existing_booking = result.scalar_one_or_none()
-    if existing_booking:
-        raise HTTPException(status_code=400, detail="Компьютер уже забронирован на это время")
+    confirmed = set(result.scalars().all())
+    booking_index.discard(set(indexed) - confirmed)
+    return bool(confirmed)
 
-    # Проверяем баланс пользователя
-    user_result = await db.execute(select(User).filter(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
+async def _create_booking(db: AsyncSession, booking: BookingCreate, user_id: int) -> Booking:
+    """Проверить слот, списать средства и создать бронирование"""
+    # Бронирования одного компьютера выполняются по очереди, разных - параллельно
+    async with computer_locks.hold(booking.computer_id):
+        return await _create_booking_locked(db, booking, user_id)
 
-    computer_result = await db.execute(select(Computer).filter(Computer.id == booking.computer_id))
+async def _create_booking_locked(db: AsyncSession, booking: BookingCreate, user_id: int) -> Booking:
+    _check_interval(booking)
+    # Быстрый отказ по индексу без блокировки строки компьютера
+    if await _index_conflict(db, booking.computer_id, booking.start_time, booking.end_time):
+        raise HTTPException(status_code=400, detail="Компьютер уже забронирован на это время")
+    if await slot_holds.conflicts(booking.computer_id, booking.start_time, booking.end_time, user_id):
+        raise HTTPException(status_code=400, detail="Слот временно удерживается другим пользователем")
+
+    # Блокируем строку компьютера до конца транзакции (SELECT ... FOR UPDATE),
+    # чтобы другой процесс не прошел проверку пересечений одновременно с нами
+    computer_result = await db.execute(
+        select(Computer).filter(Computer.id == booking.computer_id).with_for_update()
+    )
     computer = computer_result.scalar_one_or_none()
     if not computer:
         raise HTTPException(status_code=404, detail="Компьютер не найден")
 
+    # Проверяем доступность компьютера (окончательная проверка)
+    result = await db.execute(overlap_query(booking.computer_id, booking.start_time, booking.end_time))
+    existing_booking = result.scalar_one_or_none()
+    if existing_booking:
+        raise HTTPException(status_code=400, detail="Компьютер уже забронирован на это время")
+
     # Рассчитываем стоимость
     hours = (booking.end_time - booking.start_time).total_seconds() / 3600
     cost = hours * computer.hourly_rate
 
-    if user.balance < cost:
+    # Списываем средства одним условным UPDATE
+    transaction = await apply_balance_change(
+        db, user_id, -cost, "booking", f"Бронирование компьютера {computer.name}"
+    )
+    if transaction is None:
+        if not await db.get(User, user_id):
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
         raise HTTPException(status_code=400, detail="Недостаточно средств")
 
     # Создаем бронирование
     db_booking = Booking(
         **booking.dict(),
         user_id=user_id,
-        status="active"
+        status="active",
+        price=cost
     )
     
-    # Списываем средства
-    user.balance -= cost
-    
     db.add(db_booking)
+    await record_bookings(db, [db_booking])
     await db.commit()
     await db.refresh(db_booking)
+    booking_index.add(db_booking.id, db_booking.computer_id, db_booking.start_time, db_booking.end_time)
+    booking_scheduler.schedule(db_booking.id, db_booking.computer_id, db_booking.start_time, db_booking.end_time)
     
     return db_booking
 
+@router.post("/", response_model=BookingSchema)
+async def create_booking(booking: BookingCreate, user_id: int, db: AsyncSession = Depends(get_db)):
+    """Создать новое бронирование"""
+    return await _create_booking(db, booking, user_id)
+
+@router.post("/holds", response_model=SlotHoldSchema)
+async def create_hold(booking: BookingCreate, user_id: int, db: AsyncSession = Depends(get_db)):
+    """Удержать слот на несколько секунд перед оплатой"""
+    _check_interval(booking)
+    if await _index_conflict(db, booking.computer_id, booking.start_time, booking.end_time):
+        raise HTTPException(status_code=400, detail="Компьютер уже забронирован на это время")
+
+    hold = await slot_holds.acquire(user_id, booking.computer_id, booking.start_time, booking.end_time)
+    if hold is None:
+        raise HTTPException(status_code=400, detail="Слот временно удерживается другим пользователем")
+    return hold
+
+@router.post("/holds/{hold_id}/confirm", response_model=BookingSchema)
+async def confirm_hold(hold_id: str, user_id: int, db: AsyncSession = Depends(get_db)):
+    """Превратить удержание в бронирование"""
+    hold = await slot_holds.get(hold_id)
+    if not hold or hold.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Удержание не найдено или истекло")
+
+    db_booking = await _create_booking(
+        db,
+        BookingCreate(computer_id=hold.computer_id, start_time=hold.start_time, end_time=hold.end_time),
+        user_id
+    )
+    await slot_holds.release(hold_id)
+    return db_booking
+
+@router.delete("/holds/{hold_id}")
+async def release_hold(hold_id: str, user_id: int):
+    """Освободить удержание досрочно"""
+    hold = await slot_holds.get(hold_id)
+    if not hold or hold.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Удержание не найдено или истекло")
+    await slot_holds.release(hold_id)
+    return {"status": "success"}
+
+async def _create_bookings_batch_locked(
+    db: AsyncSession,
+    items: List[BookingCreate],
+    computer_ids: List[int],
+    user_id: int
+) -> List[Booking]:
+    """Создать групповое бронирование; вызывается под блокировками всех компьютеров группы"""
+    # Блокируем строки компьютеров в порядке id, чтобы исключить взаимоблокировки
+    computers_result = await db.execute(
+        select(Computer).filter(Computer.id.in_(computer_ids)).order_by(Computer.id).with_for_update()
+    )
+    computers = {computer.id: computer for computer in computers_result.scalars().all()}
+    if len(computers) != len(computer_ids):
+        raise HTTPException(status_code=404, detail="Компьютер не найден")
+
+    # Одна проверка пересечений для всех пар (компьютер, интервал)
+    conflict_result = await db.execute(
+        select(Booking.computer_id).filter(
+            Booking.status == "active",
+            or_(*[
+                and_(
+                    Booking.computer_id == item.computer_id,
+                    Booking.start_time < item.end_time,
+                    Booking.end_time > item.start_time
+                )
+                for item in items
+            ])
+        ).limit(1)
+    )
+    conflict = conflict_result.scalar_one_or_none()
+    if conflict is not None:
+        raise HTTPException(status_code=400, detail=f"Компьютер {conflict} уже забронирован на это время")
+
+    prices = [
+        (item.end_time - item.start_time).total_seconds() / 3600 * computers[item.computer_id].hourly_rate
+        for item in items
+    ]
+    cost = sum(prices)
+
+    # Одно списание за всю группу
+    transaction = await apply_balance_change(
+        db, user_id, -cost, "booking", f"Групповое бронирование: {len(items)} компьютеров"
+    )
+    if transaction is None:
+        if not await db.get(User, user_id):
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        raise HTTPException(status_code=400, detail="Недостаточно средств")
+
+    db_bookings = [
+        Booking(**item.dict(), user_id=user_id, status="active", price=price)
+        for item, price in zip(items, prices)
+    ]
+    db.add_all(db_bookings)
+    await record_bookings(db, db_bookings)
+    await db.commit()
+    return db_bookings
+
+@router.post("/batch", response_model=List[BookingSchema])
+async def create_bookings_batch(batch: BookingBatchCreate, user_id: int, db: AsyncSession = Depends(get_db)):
+    """Забронировать несколько компьютеров одной транзакцией (все или ничего)"""
+    items = batch.bookings
+    if not items:
+        raise HTTPException(status_code=400, detail="Список бронирований пуст")
+
+    # Пересечения внутри самой заявки и быстрая проверка по индексу
+    by_computer = {}
+    for item in items:
+        _check_interval(item)
+        for other in by_computer.setdefault(item.computer_id, []):
+            if item.start_time < other.end_time and item.end_time > other.start_time:
+                raise HTTPException(status_code=400, detail="Интервалы в заявке пересекаются")
+        by_computer[item.computer_id].append(item)
+        if await _index_conflict(db, item.computer_id, item.start_time, item.end_time):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Компьютер {item.computer_id} уже забронирован на это время"
+            )
+        if await slot_holds.conflicts(item.computer_id, item.start_time, item.end_time, user_id):
+            raise HTTPException(status_code=400, detail="Слот временно удерживается другим пользователем")
+
+    async with computer_locks.hold(*by_computer):
+        db_bookings = await _create_bookings_batch_locked(db, items, list(by_computer), user_id)
+
+    for db_booking in db_bookings:
+        booking_index.add(db_booking.id, db_booking.computer_id, db_booking.start_time, db_booking.end_time)
+        booking_scheduler.schedule(db_booking.id, db_booking.computer_id, db_booking.start_time, db_booking.end_time)
+
+    return db_bookings
+
 @router.put("/{booking_id}/cancel")
 async def cancel_booking(booking_id: int, db: AsyncSession = Depends(get_db)):
     """Отменить бронирование"""
@@ -89,19 +294,32 @@ async def cancel_booking(booking_id: int, db: AsyncSession = Depends(get_db)):
     if booking.start_time < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Нельзя отменить начавшееся бронирование")
     
-    booking.status = "cancelled"
-    
-    # Возвращаем средства пользователю
-    user_result = await db.execute(select(User).filter(User.id == booking.user_id))
-    user = user_result.scalar_one_or_none()
+    # Меняем статус условно, чтобы параллельная отмена не вернула деньги дважды
+    cancel_result = await db.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status == "active")
+        .values(status="cancelled")
+        .execution_options(synchronize_session=False)
+    )
+    if cancel_result.rowcount == 0:
+        raise HTTPException(status_code=400, detail="Бронирование уже завершено или отменено")
     
-    computer_result = await db.execute(select(Computer).filter(Computer.id == booking.computer_id))
-    computer = computer_result.scalar_one_or_none()
+    # Возвращаем ровно списанную сумму: тариф компьютера мог измениться после бронирования
+    refund = booking.price
+    if refund is None:
+        # Бронирования до появления колонки price: считаем по текущему тарифу
+        computer = await db.get(Computer, booking.computer_id)
+        refund = (booking.end_time - booking.start_time).total_seconds() / 3600 * computer.hourly_rate
     
-    hours = (booking.end_time - booking.start_time).total_seconds() / 3600
-    refund = hours * computer.hourly_rate
-    
-    user.balance += refund
+    transaction = await apply_balance_change(
+        db, booking.user_id, refund, "refund", f"Возврат за бронирование #{booking.id}"
+    )
+    if transaction is None:
+        # Без возврата отмену не сохраняем: сессия закроется без коммита
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    await record_bookings(db, [booking], sign=-1)
     
     await db.commit()
+    booking_index.remove(booking.id)
+    booking_scheduler.cancel(booking.id)
     return {"status": "success"} 
\ No newline at end of file
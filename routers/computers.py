@@ -1,26 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..models.database import get_db
-from ..models.models import Computer, ComputerStatus
-from ..schemas.schemas import Computer as ComputerSchema
-from ..schemas.schemas import ComputerCreate
-from sqlalchemy import select
+from models.database import get_db, get_read_db
+from models.models import Booking, Computer, ComputerStatus
+from schemas.schemas import Computer as ComputerSchema
+from schemas.schemas import ComputerCreate, AvailabilityGrid, naive_utc
+from services.availability import busy_bitmaps, encode_bitmap
+from services.cache import computer_cache
+from sqlalchemy import Select, select
+from datetime import datetime, timedelta
+
+# Ограничение размера сетки, чтобы один запрос не мог построить огромный ответ
+MAX_AVAILABILITY_SLOTS = 2880
 
 router = APIRouter(prefix="/computers", tags=["computers"])
 
 @router.get("/", response_model=List[ComputerSchema])
 async def get_computers(db: AsyncSession = Depends(get_db)):
     """Получить список всех компьютеров"""
-    result = await db.execute(select(Computer))
-    computers = result.scalars().all()
-    return computers
+    # Каталог кэшируется, поэтому читаем из основной базы: реплика с задержкой
+    # заполнила бы кэш устаревшими данными сразу после изменения
+    return await computer_cache.get_all(db)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Статистика кэша каталога компьютеров"""
+    return computer_cache.stats()
+
+def availability_query(start: datetime, end: datetime) -> Select:
+    """Активные бронирования всех компьютеров, пересекающие интервал"""
+    return select(Booking.computer_id, Booking.start_time, Booking.end_time).filter(
+        Booking.status == "active",
+        Booking.start_time < end,
+        Booking.end_time > start
+    )
+
+@router.get("/availability", response_model=AvailabilityGrid)
+async def get_availability(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    step: int = Query(30, gt=0, description="Длительность слота в минутах"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить сетку занятости всех компьютеров на интервале"""
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="Конец интервала должен быть позже начала")
+
+    step_delta = timedelta(minutes=step)
+    slots = -(-(end - start) // step_delta)
+    if slots > MAX_AVAILABILITY_SLOTS:
+        raise HTTPException(status_code=400, detail="Слишком много слотов, увеличьте шаг")
+
+    computers_result = await db.execute(select(Computer.id, Computer.status).order_by(Computer.id))
+    bookings_result = await db.execute(availability_query(start, end))
+    bitmaps = busy_bitmaps(bookings_result.all(), start, step_delta, slots)
+
+    return {
+        "start": start,
+        "end": end,
+        "step": step,
+        "slots": slots,
+        "computers": [
+            {"id": computer_id, "status": status.value, "busy": encode_bitmap(bitmaps.get(computer_id, 0), slots)}
+            for computer_id, status in computers_result.all()
+        ]
+    }
 
 @router.get("/{computer_id}", response_model=ComputerSchema)
 async def get_computer(computer_id: int, db: AsyncSession = Depends(get_db)):
     """Получить информацию о конкретном компьютере"""
-    result = await db.execute(select(Computer).filter(Computer.id == computer_id))
-    computer = result.scalar_one_or_none()
+    computer = await computer_cache.get(db, computer_id)
     if not computer:
         raise HTTPException(status_code=404, detail="Компьютер не найден")
     return computer
@@ -32,6 +82,7 @@ async def create_computer(computer: ComputerCreate, db: AsyncSession = Depends(g
     db.add(db_computer)
     await db.commit()
     await db.refresh(db_computer)
+    await computer_cache.invalidate(db_computer.id)
     return db_computer
 
 @router.put("/{computer_id}/status")
@@ -48,4 +99,5 @@ async def update_computer_status(
     
     computer.status = status
     await db.commit()
+    await computer_cache.invalidate(computer_id)
     return {"status": "success"} 
\ No newline at end of file
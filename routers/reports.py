@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from models.database import get_read_db
+from models.models import ComputerHourOccupancy, DailyRevenue
+from schemas.schemas import OccupancyHour, OccupancySummary, RevenueDay, naive_utc
+from services.rollups import HOUR
+from sqlalchemy import select, func
+from datetime import date, datetime
+
+# Почасовая детализация не больше месяца за запрос
+MAX_OCCUPANCY_HOURS = 24 * 31
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+def _hour_range(start: datetime, end: datetime):
+    """Выровнять интервал по часам и вернуть его длину в часах"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="Конец интервала должен быть позже начала")
+    start = start.replace(minute=0, second=0, microsecond=0)
+    return start, -(-(end - start) // HOUR)
+
+@router.get("/occupancy", response_model=List[OccupancyHour])
+async def get_occupancy(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    computer_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Почасовая загрузка компьютеров по агрегатам"""
+    start, end = naive_utc(start), naive_utc(end)
+    start, hours = _hour_range(start, end)
+    if hours > MAX_OCCUPANCY_HOURS:
+        raise HTTPException(status_code=400, detail="Слишком длинный интервал, используйте сводку")
+
+    query = select(ComputerHourOccupancy).filter(
+        ComputerHourOccupancy.hour >= start,
+        ComputerHourOccupancy.hour < end,
+        ComputerHourOccupancy.booked_seconds > 0
+    )
+    if computer_id is not None:
+        query = query.filter(ComputerHourOccupancy.computer_id == computer_id)
+    result = await db.execute(query.order_by(ComputerHourOccupancy.computer_id, ComputerHourOccupancy.hour))
+
+    return [
+        {
+            "computer_id": row.computer_id,
+            "hour": row.hour,
+            "booked_seconds": row.booked_seconds,
+            "occupancy": row.booked_seconds / 3600
+        }
+        for row in result.scalars().all()
+    ]
+
+@router.get("/occupancy/summary", response_model=List[OccupancySummary])
+async def get_occupancy_summary(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Суммарная загрузка каждого компьютера за интервал"""
+    start, end = naive_utc(start), naive_utc(end)
+    start, hours = _hour_range(start, end)
+    result = await db.execute(
+        select(ComputerHourOccupancy.computer_id, func.sum(ComputerHourOccupancy.booked_seconds)).filter(
+            ComputerHourOccupancy.hour >= start,
+            ComputerHourOccupancy.hour < end
+        ).group_by(ComputerHourOccupancy.computer_id)
+        .having(func.sum(ComputerHourOccupancy.booked_seconds) > 0)
+        .order_by(ComputerHourOccupancy.computer_id)
+    )
+
+    return [
+        {"computer_id": computer_id, "booked_hours": seconds / 3600, "occupancy": seconds / (hours * 3600)}
+        for computer_id, seconds in result.all()
+    ]
+
+@router.get("/revenue", response_model=List[RevenueDay])
+async def get_revenue(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    type: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Дневные суммы транзакций по типам (границы включительно)"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="Конец интервала должен быть не раньше начала")
+
+    query = select(DailyRevenue).filter(DailyRevenue.day >= start, DailyRevenue.day <= end)
+    if type is not None:
+        query = query.filter(DailyRevenue.type == type)
+    result = await db.execute(query.order_by(DailyRevenue.day, DailyRevenue.type))
+    return result.scalars().all()
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Header, HTTPException, Request
+from typing import Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+@router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    """Принять обновление от Telegram"""
+    secret = os.getenv("WEBHOOK_SECRET")
+    if secret and x_telegram_bot_api_secret_token != secret:
+        raise HTTPException(status_code=403, detail="Неверный секретный токен")
+
+    processor = getattr(request.app.state, "bot_webhook", None)
+    if processor is None:
+        raise HTTPException(status_code=503, detail="Бот работает не в режиме вебхука")
+
+    try:
+        data = await request.json()
+    except ValueError:
+        logger.warning("Тело запроса вебхука не является JSON")
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    update = processor.parse(data)
+    if update is None:
+        raise HTTPException(status_code=400, detail="Некорректное обновление")
+
+    # При переполненной очереди Telegram повторит доставку позже
+    if not processor.submit(update):
+        raise HTTPException(status_code=503, detail="Очередь обновлений переполнена")
+    return {"ok": True}
@@ -1,20 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from ..models.database import get_db
-from ..models.models import Transaction, User
-from ..schemas.schemas import Transaction as TransactionSchema
-from ..schemas.schemas import TransactionCreate
-from sqlalchemy import select
+from typing import List, Optional
+from models.database import get_db, get_read_db, open_read_session
+from models.models import Transaction, User, UserRole
+from schemas.schemas import Transaction as TransactionSchema
+from schemas.schemas import TransactionCreate
+from services.pagination import paginate, stream_ndjson
+from services.ledger import apply_balance_change, reconcile
+from services.export import export_query, iter_chunks, csv_chunk, parquet_available, ParquetChunkWriter
+from sqlalchemy import Select, select
+from datetime import datetime
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
+async def _require_admin(db: AsyncSession, admin_id: int, detail: str):
+    result = await db.execute(select(User.role).filter(User.id == admin_id))
+    if result.scalar_one_or_none() != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail=detail)
+
+def user_transactions_query(user_id: int) -> Select:
+    return select(Transaction).filter(Transaction.user_id == user_id)
+
 @router.get("/user/{user_id}", response_model=List[TransactionSchema])
-async def get_user_transactions(user_id: int, db: AsyncSession = Depends(get_db)):
-    """Получить все транзакции пользователя"""
-    result = await db.execute(select(Transaction).filter(Transaction.user_id == user_id))
-    transactions = result.scalars().all()
-    return transactions
+async def get_user_transactions(
+    user_id: int,
+    response: Response,
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[int] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить транзакции пользователя постранично или потоком NDJSON"""
+    query = user_transactions_query(user_id)
+    if stream:
+        return stream_ndjson(query, Transaction, TransactionSchema, cursor)
+    return await paginate(db, query, Transaction, response, limit, cursor)
+
+@router.get("/export")
+async def export_transactions(
+    admin_id: int,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    type: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Выгрузить транзакции в CSV или Parquet потоком (только для администраторов).
+
+    Прерванную выгрузку можно продолжить с after_id, равным последнему полученному id.
+    """
+    await _require_admin(db, admin_id, "Выгрузка доступна только администраторам")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Выгрузка в Parquet недоступна: не установлен pyarrow")
+
+    query = export_query(start, end, type, after_id)
+
+    async def generate_csv():
+        # Отдельная сессия: ответ продолжает отправляться после выхода из обработчика
+        async with await open_read_session() as export_db:
+            yield csv_chunk([], header=True)
+            async for rows in iter_chunks(export_db, query):
+                yield csv_chunk(rows)
+
+    async def generate_parquet():
+        writer = ParquetChunkWriter()
+        async with await open_read_session() as export_db:
+            async for rows in iter_chunks(export_db, query):
+                writer.write(rows)
+                yield writer.take()
+        writer.close()
+        yield writer.take()
+
+    filename = f"transactions.{format}"
+    return StreamingResponse(
+        generate_csv() if format == "csv" else generate_parquet(),
+        media_type="text/csv" if format == "csv" else "application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.post("/deposit", response_model=TransactionSchema)
 async def create_deposit(
@@ -26,24 +90,11 @@ async def create_deposit(
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Сумма должна быть положительной")
 
-    # Находим пользователя
-    user_result = await db.execute(select(User).filter(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
+    # Обновляем баланс и записываем транзакцию
+    transaction = await apply_balance_change(db, user_id, amount, "deposit", "Пополнение баланса")
+    if transaction is None:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    # Создаем транзакцию
-    transaction = Transaction(
-        user_id=user_id,
-        amount=amount,
-        type="deposit",
-        description="Пополнение баланса"
-    )
     
-    # Обновляем баланс пользователя
-    user.balance += amount
-    
-    db.add(transaction)
     await db.commit()
     await db.refresh(transaction)
     
@@ -59,29 +110,20 @@ async def create_withdrawal(
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Сумма должна быть положительной")
 
-    # Находим пользователя
-    user_result = await db.execute(select(User).filter(User.id == user_id))
-    user = user_result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(status_code=404, detail="Пользователь не найден")
-
-    # Проверяем достаточно ли средств
-    if user.balance < amount:
+    # Списываем средства, только если их достаточно
+    transaction = await apply_balance_change(db, user_id, -amount, "withdrawal", "Списание средств")
+    if transaction is None:
+        if not await db.get(User, user_id):
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
         raise HTTPException(status_code=400, detail="Недостаточно средств")
-
-    # Создаем транзакцию
-    transaction = Transaction(
-        user_id=user_id,
-        amount=-amount,
-        type="withdrawal",
-        description="Списание средств"
-    )
-    
-    # Обновляем баланс пользователя
-    user.balance -= amount
     
-    db.add(transaction)
     await db.commit()
     await db.refresh(transaction)
     
-    return transaction 
\ No newline at end of file
+    return transaction
+
+@router.post("/reconcile")
+async def reconcile_balances(admin_id: int, db: AsyncSession = Depends(get_db)):
+    """Сверить балансы пользователей с журналом транзакций (только для администраторов)"""
+    await _require_admin(db, admin_id, "Сверка доступна только администраторам")
+    return await reconcile(db)
\ No newline at end of file
@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from ..models.database import get_db
-from ..models.models import User, UserRole
-from ..schemas.schemas import User as UserSchema
+from typing import List, Optional
+from models.database import get_db, get_read_db
+from models.models import User, UserRole
+from schemas.schemas import User as UserSchema
+from services.pagination import paginate, stream_ndjson
 from sqlalchemy import select
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[UserSchema])
-async def get_users(db: AsyncSession = Depends(get_db)):
-    """Получить список всех пользователей"""
-    result = await db.execute(select(User))
-    users = result.scalars().all()
-    return users
+async def get_users(
+    response: Response,
+    limit: int = Query(100, gt=0, le=1000),
+    cursor: Optional[int] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Получить список пользователей постранично или потоком NDJSON"""
+    query = select(User)
+    if stream:
+        return stream_ndjson(query, User, UserSchema, cursor)
+    return await paginate(db, query, User, response, limit, cursor)
 
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
@@ -1,8 +1,14 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, field_validator
+from datetime import date, datetime, timezone
 from typing import Optional, List
 from enum import Enum
 
+def naive_utc(value: datetime) -> datetime:
+    """Привести время к UTC без часового пояса, как оно хранится в базе и индексе занятости"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class UserRole(str, Enum):
     ADMIN = "admin"
     USER = "user"
@@ -44,14 +50,40 @@ class Computer(ComputerBase):
     class Config:
         from_attributes = True
 
+class ComputerAvailability(BaseModel):
+    id: int
+    status: ComputerStatus
+    busy: str  # base64-битовая карта занятости, слот i - бит i (старший бит первым)
+
+class AvailabilityGrid(BaseModel):
+    start: datetime
+    end: datetime
+    step: int  # длительность слота в минутах
+    slots: int
+    computers: List[ComputerAvailability]
+
 class BookingBase(BaseModel):
     computer_id: int
     start_time: datetime
     end_time: datetime
 
+    # Клиенты присылают время с поясом (toISOString() в JS дает "Z")
+    _naive_utc = field_validator("start_time", "end_time")(naive_utc)
+
 class BookingCreate(BookingBase):
     pass
 
+class BookingBatchCreate(BaseModel):
+    bookings: List[BookingCreate]
+
+class SlotHold(BookingBase):
+    hold_id: str
+    user_id: int
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class Booking(BookingBase):
     id: int
     user_id: int
@@ -76,6 +108,26 @@ class Transaction(TransactionBase):
     class Config:
         from_attributes = True
 
+class OccupancyHour(BaseModel):
+    computer_id: int
+    hour: datetime
+    booked_seconds: int
+    occupancy: float  # доля занятого времени внутри часа
+
+class OccupancySummary(BaseModel):
+    computer_id: int
+    booked_hours: float
+    occupancy: float  # доля занятого времени за весь интервал
+
+class RevenueDay(BaseModel):
+    day: date
+    type: str
+    amount: float
+    count: int
+
+    class Config:
+        from_attributes = True
+
 class TelegramWebAppData(BaseModel):
     query_id: Optional[str]
     user: dict
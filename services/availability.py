@@ -0,0 +1,30 @@
+import base64
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+
+def busy_bitmaps(
+    bookings: Iterable[Tuple[int, datetime, datetime]],
+    start: datetime,
+    step: timedelta,
+    slots: int
+) -> Dict[int, int]:
+    """Построить битовые карты занятости по компьютерам за один проход по бронированиям"""
+    width = math.ceil(slots / 8) * 8
+    bitmaps: Dict[int, int] = {}
+    for computer_id, booking_start, booking_end in bookings:
+        first = max(0, math.floor((booking_start - start) / step))
+        last = min(slots, math.ceil((booking_end - start) / step))
+        if first >= last:
+            continue
+        # Занимаем сразу весь диапазон слотов одной маской
+        mask = ((1 << (last - first)) - 1) << (width - last)
+        bitmaps[computer_id] = bitmaps.get(computer_id, 0) | mask
+    return bitmaps
+
+
+def encode_bitmap(bitmap: int, slots: int) -> str:
+    """Закодировать битовую карту в base64"""
+    size = math.ceil(slots / 8)
+    return base64.b64encode(bitmap.to_bytes(size, "big")).decode("ascii")
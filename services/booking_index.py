@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Booking
+
+logger = logging.getLogger(__name__)
+
+# Интервал бронирования: (начало, конец, id бронирования)
+Interval = Tuple[datetime, datetime, int]
+
+
+class BookingIndex:
+    """Индекс активных бронирований по компьютерам для быстрой проверки занятости.
+
+    Индекс процесса не видит отмен и завершений в других воркерах, поэтому
+    занятость по индексу - только подсказка, которую нужно подтвердить в базе.
+    """
+
+    def __init__(self):
+        # computer_id -> отсортированный по началу список непересекающихся интервалов
+        self._intervals: Dict[int, List[Interval]] = defaultdict(list)
+        # booking_id -> (computer_id, интервал)
+        self._by_booking: Dict[int, Tuple[int, Interval]] = {}
+        self.loaded = False
+
+    async def load(self, db: AsyncSession):
+        """Загрузить актуальные активные бронирования из базы"""
+        result = await db.execute(
+            select(Booking.id, Booking.computer_id, Booking.start_time, Booking.end_time).filter(
+                Booking.status == "active",
+                Booking.end_time > datetime.utcnow()
+            )
+        )
+        self._intervals.clear()
+        self._by_booking.clear()
+        for booking_id, computer_id, start_time, end_time in result.all():
+            self.add(booking_id, computer_id, start_time, end_time)
+        self.loaded = True
+
+    def add(self, booking_id: int, computer_id: int, start_time: datetime, end_time: datetime):
+        """Добавить бронирование в индекс"""
+        if booking_id in self._by_booking:
+            self.remove(booking_id)
+        interval = (start_time, end_time, booking_id)
+        insort(self._intervals[computer_id], interval)
+        self._by_booking[booking_id] = (computer_id, interval)
+
+    def remove(self, booking_id: int):
+        """Удалить бронирование из индекса (отмена или завершение)"""
+        entry = self._by_booking.pop(booking_id, None)
+        if entry is None:
+            return
+        computer_id, interval = entry
+        intervals = self._intervals[computer_id]
+        pos = bisect_left(intervals, interval)
+        if pos < len(intervals) and intervals[pos] == interval:
+            del intervals[pos]
+        if not intervals:
+            del self._intervals[computer_id]
+
+    def discard(self, booking_ids: Iterable[int]):
+        """Удалить устаревшие записи"""
+        for booking_id in booking_ids:
+            self.remove(booking_id)
+
+    def overlapping(self, computer_id: int, start_time: datetime, end_time: datetime) -> List[int]:
+        """Бронирования компьютера в индексе, пересекающиеся с [start_time, end_time)"""
+        intervals = self._intervals.get(computer_id)
+        if not intervals:
+            return []
+        # Интервалы одного компьютера не пересекаются, поэтому слева достаточно
+        # проверить соседа позиции, куда встал бы новый интервал
+        pos = bisect_left(intervals, (start_time,))
+        found = []
+        if pos > 0 and intervals[pos - 1][1] > start_time:
+            found.append(intervals[pos - 1][2])
+        while pos < len(intervals) and intervals[pos][0] < end_time:
+            found.append(intervals[pos][2])
+            pos += 1
+        return found
+
+    def is_free(self, computer_id: int, start_time: datetime, end_time: datetime) -> bool:
+        """Проверить, свободен ли компьютер на интервале [start_time, end_time)"""
+        return not self.overlapping(computer_id, start_time, end_time)
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Удалить закончившиеся интервалы; возвращает число удаленных"""
+        now = now or datetime.utcnow()
+        removed = 0
+        for computer_id in list(self._intervals):
+            intervals = self._intervals[computer_id]
+            # Интервалы не пересекаются, поэтому концы упорядочены так же, как начала
+            ended = 0
+            while ended < len(intervals) and intervals[ended][1] <= now:
+                self._by_booking.pop(intervals[ended][2], None)
+                ended += 1
+            if ended:
+                del intervals[:ended]
+                removed += ended
+            if not intervals:
+                del self._intervals[computer_id]
+        return removed
+
+    async def check_consistency(self, db: AsyncSession) -> dict:
+        """Сверить индекс с таблицей bookings"""
+        result = await db.execute(
+            select(Booking.id, Booking.computer_id, Booking.start_time, Booking.end_time).filter(
+                Booking.status == "active",
+                Booking.end_time > datetime.utcnow()
+            )
+        )
+        expected = {
+            booking_id: (computer_id, (start_time, end_time, booking_id))
+            for booking_id, computer_id, start_time, end_time in result.all()
+        }
+        now = datetime.utcnow()
+        indexed = {
+            booking_id: entry
+            for booking_id, entry in self._by_booking.items()
+            if entry[1][1] > now
+        }
+        missing = sorted(set(expected) - set(indexed))
+        extra = sorted(set(indexed) - set(expected))
+        mismatched = sorted(
+            booking_id for booking_id in set(expected) & set(indexed)
+            if expected[booking_id] != indexed[booking_id]
+        )
+        return {
+            "consistent": not (missing or extra or mismatched),
+            "indexed": len(indexed),
+            "missing": missing,
+            "extra": extra,
+            "mismatched": mismatched
+        }
+
+
+booking_index = BookingIndex()
+
+
+async def run_pruning(interval: float):
+    """Периодически удалять из индекса закончившиеся бронирования"""
+    while True:
+        await asyncio.sleep(interval)
+        removed = booking_index.prune()
+        if removed:
+            logger.debug("Из индекса бронирований удалено закончившихся интервалов: %s", removed)
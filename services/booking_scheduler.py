@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import SessionLocal
+from models.models import Booking, Computer, ComputerStatus
+from services.booking_index import booking_index
+from services.cache import computer_cache
+
+logger = logging.getLogger(__name__)
+
+# При одинаковом времени окончание обрабатывается раньше начала,
+# чтобы бронирования «встык» на одном компьютере не конфликтовали
+END = 0
+START = 1
+
+RETRY_DELAY = timedelta(seconds=5)
+# Не больше стольких id в одном UPDATE ... IN (у asyncpg предел 32767 параметров)
+APPLY_BATCH_SIZE = 1000
+
+# Событие: (время, вид, id бронирования, id компьютера)
+Event = Tuple[datetime, int, int, int]
+
+
+class BookingScheduler:
+    """Переводит бронирования и компьютеры между статусами по таймерам из min-кучи"""
+
+    def __init__(self):
+        self._heap: List[Event] = []
+        self._cancelled: Set[int] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self, db: AsyncSession):
+        """Догнать пропущенные события одним запросом и загрузить предстоящие"""
+        now = datetime.utcnow()
+        await db.execute(
+            update(Booking)
+            .where(Booking.status == "active", Booking.end_time <= now)
+            .values(status="completed")
+            .execution_options(synchronize_session=False)
+        )
+        in_progress = select(Booking.computer_id).filter(
+            Booking.status == "active",
+            Booking.start_time <= now,
+            Booking.end_time > now
+        )
+        ended = select(Booking.computer_id).filter(Booking.status == "completed", Booking.end_time <= now)
+        result = await db.execute(
+            update(Computer)
+            .where(
+                Computer.id.in_(ended),
+                Computer.status == ComputerStatus.OCCUPIED,
+                Computer.id.not_in(in_progress)
+            )
+            .values(status=ComputerStatus.AVAILABLE)
+            .returning(Computer.id)
+            .execution_options(synchronize_session=False)
+        )
+        changed_computers = set(result.scalars().all())
+        result = await db.execute(
+            update(Computer)
+            .where(Computer.id.in_(in_progress), Computer.status == ComputerStatus.AVAILABLE)
+            .values(status=ComputerStatus.OCCUPIED)
+            .returning(Computer.id)
+            .execution_options(synchronize_session=False)
+        )
+        changed_computers.update(result.scalars().all())
+        await db.commit()
+        if changed_computers:
+            await computer_cache.invalidate(*changed_computers)
+
+        # В кучу попадают только будущие события: начавшиеся бронирования уже заняли компьютер
+        result = await db.execute(
+            select(Booking.id, Booking.computer_id, Booking.start_time, Booking.end_time).filter(
+                Booking.status == "active",
+                Booking.end_time > now
+            )
+        )
+        self._heap = []
+        self._cancelled.clear()
+        for booking_id, computer_id, start_time, end_time in result.all():
+            if start_time > now:
+                self._heap.append((start_time, START, booking_id, computer_id))
+            self._heap.append((end_time, END, booking_id, computer_id))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def schedule(self, booking_id: int, computer_id: int, start_time: datetime, end_time: datetime):
+        """Добавить события нового бронирования"""
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (start_time, START, booking_id, computer_id))
+        heapq.heappush(self._heap, (end_time, END, booking_id, computer_id))
+        if earliest is None or start_time < earliest:
+            self._wakeup.set()
+
+    def cancel(self, booking_id: int):
+        """Отменить события бронирования (удаляются из кучи лениво)"""
+        self._cancelled.add(booking_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            due = self._pop_due(datetime.utcnow())
+            if not due:
+                continue
+            try:
+                await self._apply(due)
+            except Exception:
+                logger.exception("Не удалось применить %s событий бронирований, повтор позже", len(due))
+                retry_at = datetime.utcnow() + RETRY_DELAY
+                for _, kind, booking_id, computer_id in due:
+                    heapq.heappush(self._heap, (retry_at, kind, booking_id, computer_id))
+
+    def _pop_due(self, now: datetime) -> List[Event]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            event = heapq.heappop(self._heap)
+            if event[2] in self._cancelled:
+                if event[1] == END:
+                    self._cancelled.discard(event[2])
+                continue
+            due.append(event)
+        return due
+
+    async def _apply(self, events: List[Event]):
+        """Применить пачку наступивших событий несколькими UPDATE, id передаются частями"""
+        ended_ids = [booking_id for _, kind, booking_id, _ in events if kind == END]
+        started_ids = [booking_id for _, kind, booking_id, _ in events if kind == START]
+        now = datetime.utcnow()
+        changed_computers: Set[int] = set()
+        completed_ids: List[int] = []
+        freed: Set[int] = set()
+
+        async with SessionLocal() as db:
+            for offset in range(0, len(ended_ids), APPLY_BATCH_SIZE):
+                result = await db.execute(
+                    update(Booking)
+                    .where(Booking.id.in_(ended_ids[offset:offset + APPLY_BATCH_SIZE]), Booking.status == "active")
+                    .values(status="completed")
+                    .returning(Booking.id, Booking.computer_id)
+                    .execution_options(synchronize_session=False)
+                )
+                rows = result.all()
+                completed_ids.extend(booking_id for booking_id, _ in rows)
+                freed.update(computer_id for _, computer_id in rows)
+            if freed:
+                # Не освобождаем компьютер, если на нем уже идет следующее бронирование
+                in_progress = select(Booking.computer_id).filter(
+                    Booking.status == "active",
+                    Booking.start_time <= now,
+                    Booking.end_time > now
+                )
+                result = await db.execute(
+                    update(Computer)
+                    .where(
+                        Computer.id.in_(freed),
+                        Computer.status == ComputerStatus.OCCUPIED,
+                        Computer.id.not_in(in_progress)
+                    )
+                    .values(status=ComputerStatus.AVAILABLE)
+                    .returning(Computer.id)
+                    .execution_options(synchronize_session=False)
+                )
+                changed_computers.update(result.scalars().all())
+
+            for offset in range(0, len(started_ids), APPLY_BATCH_SIZE):
+                started = select(Booking.computer_id).filter(
+                    Booking.id.in_(started_ids[offset:offset + APPLY_BATCH_SIZE]),
+                    Booking.status == "active"
+                )
+                result = await db.execute(
+                    update(Computer)
+                    .where(Computer.id.in_(started), Computer.status == ComputerStatus.AVAILABLE)
+                    .values(status=ComputerStatus.OCCUPIED)
+                    .returning(Computer.id)
+                    .execution_options(synchronize_session=False)
+                )
+                changed_computers.update(result.scalars().all())
+
+            await db.commit()
+
+        for booking_id in completed_ids:
+            booking_index.remove(booking_id)
+        if changed_computers:
+            await computer_cache.invalidate(*changed_computers)
+
+
+booking_scheduler = BookingScheduler()
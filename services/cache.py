@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Computer
+from schemas.schemas import Computer as ComputerSchema
+
+
+class MemoryCache:
+    """Кэш в памяти процесса с временем жизни записей"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisCache:
+    """Кэш в Redis, общий для всех процессов API"""
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = "pc_club:"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost"), decode_responses=True)
+        self._client = client
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._client.set(self._prefix + key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*(self._prefix + key for key in keys))
+
+
+def create_cache_backend():
+    """Выбрать хранилище кэша по переменной окружения CACHE_BACKEND (memory или redis)"""
+    if os.getenv("CACHE_BACKEND", "memory") == "redis":
+        return RedisCache()
+    return MemoryCache()
+
+
+class ComputerCache:
+    """Сквозной кэш каталога компьютеров со счетчиками попаданий и промахов"""
+
+    ALL_KEY = "computers:all"
+
+    def __init__(self, backend, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(computer_id: int) -> str:
+        return f"computers:{computer_id}"
+
+    @staticmethod
+    def _dump(computer: Computer) -> dict:
+        return ComputerSchema.model_validate(computer).model_dump(mode="json")
+
+    async def get_all(self, db: AsyncSession) -> List[dict]:
+        """Получить все компьютеры"""
+        cached = await self.backend.get(self.ALL_KEY)
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+        self.misses += 1
+        result = await db.execute(select(Computer))
+        computers = [self._dump(computer) for computer in result.scalars().all()]
+        await self.backend.set(self.ALL_KEY, json.dumps(computers), self.ttl)
+        return computers
+
+    async def get(self, db: AsyncSession, computer_id: int) -> Optional[dict]:
+        """Получить компьютер по id"""
+        cached = await self.backend.get(self._key(computer_id))
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+        self.misses += 1
+        result = await db.execute(select(Computer).filter(Computer.id == computer_id))
+        computer = result.scalar_one_or_none()
+        if computer is None:
+            return None
+        data = self._dump(computer)
+        await self.backend.set(self._key(computer_id), json.dumps(data), self.ttl)
+        return data
+
+    async def invalidate(self, *computer_ids: int):
+        """Сбросить записи компьютеров и общий список"""
+        await self.backend.delete(self.ALL_KEY, *(self._key(computer_id) for computer_id in computer_ids))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
+
+
+computer_cache = ComputerCache(create_cache_backend(), ttl=float(os.getenv("COMPUTER_CACHE_TTL", "60")))
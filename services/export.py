@@ -0,0 +1,113 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Transaction
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet - необязательная зависимость
+    pyarrow = None
+
+# Строк в одной пачке серверного курсора и в одной группе строк Parquet
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_COLUMNS = ("id", "user_id", "amount", "type", "description", "created_at")
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+
+def export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[str] = None,
+    after_id: Optional[int] = None
+) -> Select:
+    """Запрос выгрузки транзакций по возрастанию id с фильтрами и точкой продолжения"""
+    query = select(*(getattr(Transaction, column) for column in EXPORT_COLUMNS))
+    if start is not None:
+        query = query.filter(Transaction.created_at >= start)
+    if end is not None:
+        query = query.filter(Transaction.created_at < end)
+    if type is not None:
+        query = query.filter(Transaction.type == type)
+    if after_id is not None:
+        query = query.filter(Transaction.id > after_id)
+    return query.order_by(Transaction.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+
+async def iter_chunks(db: AsyncSession, query: Select) -> AsyncIterator[list]:
+    """Читать строки серверным курсором пачками; в памяти одновременно только одна пачка"""
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
+
+
+def csv_chunk(rows: list, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файловый объект, из которого записанные байты забираются по частям"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class ParquetChunkWriter:
+    """Запись Parquet по группам строк: каждая пачка курсора становится отдельной группой"""
+
+    def __init__(self, sink=None):
+        if pyarrow is None:
+            raise RuntimeError("Для выгрузки в Parquet установите pyarrow")
+        self.schema = pyarrow.schema([
+            ("id", pyarrow.int64()),
+            ("user_id", pyarrow.int64()),
+            ("amount", pyarrow.float64()),
+            ("type", pyarrow.string()),
+            ("description", pyarrow.string()),
+            ("created_at", pyarrow.timestamp("us")),
+        ])
+        # Без явного приемника байты копятся в буфере и забираются через take()
+        self.sink = sink if sink is not None else _ChunkSink()
+        self.writer = pyarrow.parquet.ParquetWriter(self.sink, self.schema)
+
+    def write(self, rows: list):
+        columns = list(zip(*rows))
+        self.writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+    def close(self):
+        self.writer.close()
+
+    def take(self) -> bytes:
+        return self.sink.take()
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, insert, select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import SessionLocal, upsert
+from models.models import User, Transaction, LedgerCheckpoint, LedgerTotal
+from services.user_cache import mark_balance_changed
+
+logger = logging.getLogger(__name__)
+
+# Транзакции моложе этого интервала сверка не трогает: они могут быть еще не закоммичены
+RECONCILE_LAG = timedelta(seconds=30)
+# Допустимое расхождение из-за округления Float
+BALANCE_TOLERANCE = 0.005
+
+
+async def apply_balance_change(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    type: str,
+    description: str
+) -> Optional[Transaction]:
+    """Атомарно изменить баланс и записать транзакцию в журнал.
+
+    Возвращает None, если пользователь не найден или средств недостаточно.
+    Коммит остается за вызывающим кодом.
+    """
+    query = update(User).where(User.id == user_id)
+    if amount < 0:
+        query = query.where(User.balance >= -amount)
+    result = await db.execute(
+        query.values(balance=User.balance + amount)
+        .returning(User.balance)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is None:
+        return None
+    mark_balance_changed(db, user_id)
+
+    transaction = Transaction(
+        user_id=user_id,
+        amount=amount,
+        type=type,
+        description=description,
+        created_at=datetime.utcnow()
+    )
+    db.add(transaction)
+    return transaction
+
+
+async def _open_ledger(db: AsyncSession, cutoff: datetime) -> int:
+    """Начальные суммы журнала из текущих балансов при первом запуске сверки.
+
+    Возвращает id транзакции, с которой начинается инкрементальная сверка.
+    """
+    last_id = await db.scalar(
+        select(func.max(Transaction.id)).filter(Transaction.created_at <= cutoff)
+    ) or 0
+    # Баланс минус еще не учтенные транзакции; одним запросом, чтобы не мешали параллельные списания
+    pending = select(func.coalesce(func.sum(Transaction.amount), 0.0)).filter(
+        Transaction.user_id == User.id,
+        Transaction.id > last_id
+    ).scalar_subquery()
+    await db.execute(delete(LedgerTotal))
+    await db.execute(
+        insert(LedgerTotal).from_select(
+            ["user_id", "total"],
+            select(User.id, func.coalesce(User.balance, 0.0) - pending)
+        )
+    )
+    return last_id
+
+
+async def reconcile(db: AsyncSession) -> dict:
+    """Инкрементальная сверка балансов с журналом транзакций от сохраненной контрольной точки"""
+    cutoff = datetime.utcnow() - RECONCILE_LAG
+    # Контрольную точку создает первый из параллельных сверщиков, остальные ждут его коммита
+    created = await db.execute(
+        upsert(db, LedgerCheckpoint)
+        .values(id=1, last_transaction_id=0, updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(LedgerCheckpoint.id)
+    )
+    opened = created.scalar_one_or_none() is not None
+    # Блокировка строки не дает двум сверкам учесть одни и те же транзакции дважды
+    checkpoint = (await db.execute(
+        select(LedgerCheckpoint).filter(LedgerCheckpoint.id == 1).with_for_update()
+    )).scalar_one()
+    if opened:
+        checkpoint.last_transaction_id = await _open_ledger(db, cutoff)
+    last_id = checkpoint.last_transaction_id or 0
+
+    result = await db.execute(
+        select(Transaction.user_id, func.sum(Transaction.amount), func.max(Transaction.id)).filter(
+            Transaction.id > last_id,
+            Transaction.created_at <= cutoff
+        ).group_by(Transaction.user_id)
+    )
+    new_sums = {}
+    new_last_id = last_id
+    for user_id, amount, max_id in result.all():
+        new_sums[user_id] = amount
+        new_last_id = max(new_last_id, max_id)
+
+    if not new_sums:
+        await db.commit()
+        return {"checked_users": 0, "last_transaction_id": last_id, "discrepancies": []}
+
+    totals_result = await db.execute(select(LedgerTotal).filter(LedgerTotal.user_id.in_(new_sums)))
+    totals = {total.user_id: total for total in totals_result.scalars().all()}
+    for user_id, amount in new_sums.items():
+        if user_id in totals:
+            totals[user_id].total += amount
+        else:
+            db.add(LedgerTotal(user_id=user_id, total=amount))
+    await db.flush()
+
+    # Баланс и транзакции после контрольной точки читаем одним запросом,
+    # чтобы параллельные списания не давали ложных расхождений
+    pending = select(func.coalesce(func.sum(Transaction.amount), 0.0)).filter(
+        Transaction.user_id == User.id,
+        Transaction.id > new_last_id
+    ).scalar_subquery()
+    check_result = await db.execute(
+        select(User.id, User.balance, LedgerTotal.total, pending)
+        .join(LedgerTotal, LedgerTotal.user_id == User.id)
+        .filter(User.id.in_(new_sums))
+    )
+    discrepancies = [
+        {"user_id": user_id, "balance": balance, "ledger": total + pending_amount}
+        for user_id, balance, total, pending_amount in check_result.all()
+        if abs((balance or 0.0) - (total + pending_amount)) > BALANCE_TOLERANCE
+    ]
+
+    checkpoint.last_transaction_id = new_last_id
+    checkpoint.updated_at = datetime.utcnow()
+    await db.commit()
+
+    return {
+        "checked_users": len(new_sums),
+        "last_transaction_id": new_last_id,
+        "discrepancies": discrepancies
+    }
+
+
+async def run_reconciliation(interval: float):
+    """Периодически запускать сверку в фоне"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                report = await reconcile(db)
+            for item in report["discrepancies"]:
+                logger.warning("Баланс пользователя %(user_id)s расходится с журналом: %(balance)s != %(ledger)s", item)
+        except Exception:
+            logger.exception("Ошибка сверки балансов")
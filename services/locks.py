@@ -0,0 +1,32 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import List
+
+
+class LockStripes:
+    """Фиксированный набор asyncio-блокировок, ключ попадает в полосу по модулю.
+
+    Запросы к разным компьютерам почти всегда идут параллельно,
+    к одному и тому же - строго по очереди внутри процесса.
+    """
+
+    def __init__(self, stripes: int = 256):
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(stripes)]
+
+    @asynccontextmanager
+    async def hold(self, *keys: int):
+        # Захватываем полосы в порядке возрастания, чтобы исключить взаимоблокировки
+        indexes = sorted({key % len(self._locks) for key in keys})
+        acquired = []
+        try:
+            for index in indexes:
+                await self._locks[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self._locks[index].release()
+
+
+computer_locks = LockStripes(int(os.getenv("COMPUTER_LOCK_STRIPES", "256")))
@@ -0,0 +1,246 @@
+import functools
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Формат ответа /metrics (Prometheus text exposition)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Параметры медленного запроса в журнале обрезаются до этой длины
+SLOW_QUERY_PARAMS_LIMIT = 1000
+
+slow_query_logger = logging.getLogger("slow_query")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по корзинам (не накопительные) + корзина +Inf, сумма]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, labels: Tuple, value: float):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Gauge:
+    """Значения снимаются функциями в момент запроса /metrics"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._collectors: Dict[Tuple, Callable[[], float]] = {}
+
+    def track(self, labels: Tuple, collect: Callable[[], float]):
+        self._collectors[labels] = collect
+
+    def render(self):
+        if not self._collectors:
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, collect in sorted(self._collectors.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {collect()}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "Обработанные HTTP-запросы", ("method", "route", "status")
+))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")
+))
+http_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "Число SQL-запросов за HTTP-запрос", ("method", "route"), QUERY_COUNT_BUCKETS
+))
+http_db_duration = registry.register(Histogram(
+    "http_request_db_seconds", "Суммарное время SQL-запросов за HTTP-запрос", ("method", "route")
+))
+db_queries = registry.register(Counter(
+    "db_queries_total", "Все SQL-запросы, включая фоновые задачи и бота"
+))
+bot_handler_duration = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчиков бота", ("handler", "outcome")
+))
+db_pool_size = registry.register(Gauge("db_pool_size", "Размер пула соединений", ("engine",)))
+db_pool_checked_out = registry.register(Gauge("db_pool_checked_out", "Соединения, выданные из пула", ("engine",)))
+db_pool_checked_in = registry.register(Gauge("db_pool_checked_in", "Свободные соединения в пуле", ("engine",)))
+db_pool_overflow = registry.register(Gauge("db_pool_overflow", "Соединения сверх размера пула", ("engine",)))
+
+
+class RequestStats:
+    """Учет SQL-запросов в рамках одного HTTP-запроса"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        # Шаблон пути (/bookings/{booking_id}) известен после маршрутизации; сам путь дал бы бесконечное число меток
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время, статус и SQL-запросы каждого HTTP-запроса, включая потоковые ответы"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            labels = (scope["method"], stats.route)
+            http_requests.inc(labels + (str(status),))
+            http_duration.observe(labels, elapsed)
+            http_db_queries.observe(labels, stats.queries)
+            http_db_duration.observe(labels, stats.db_time)
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary", slow_query_ms: float = 0):
+    """Подписаться на события движка: учет запросов, журнал медленных запросов и показатели пула.
+
+    name - метка движка в показателях пула; slow_query_ms = 0 отключает журнал медленных запросов.
+    """
+    sync_engine = engine.sync_engine
+    slow_query_seconds = slow_query_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.query_started
+        db_queries.inc()
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if slow_query_seconds and elapsed >= slow_query_seconds:
+            slow_query_logger.warning(
+                "%.1f мс, маршрут %s: %s; параметры: %s",
+                elapsed * 1000,
+                stats.route if stats is not None else "фоновая задача",
+                statement,
+                repr(parameters)[:SLOW_QUERY_PARAMS_LIMIT]
+            )
+
+    # У пулов без очереди (NullPool у aiosqlite, StaticPool) этих показателей нет.
+    # Пул читаем при каждом сборе: engine.dispose() заменяет его новым
+    if hasattr(sync_engine.pool, "checkedout"):
+        labels = (name,)
+        db_pool_size.track(labels, lambda: sync_engine.pool.size())
+        db_pool_checked_out.track(labels, lambda: sync_engine.pool.checkedout())
+        db_pool_checked_in.track(labels, lambda: sync_engine.pool.checkedin())
+        # overflow() отрицателен, пока пул не заполнен
+        db_pool_overflow.track(labels, lambda: max(0, sync_engine.pool.overflow()))
+
+
+def timed_handler(handler):
+    """Обернуть обработчик бота замером времени"""
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await handler(update, context)
+            outcome = "ok"
+            return result
+        finally:
+            bot_handler_duration.observe((handler.__name__, outcome), time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,51 @@
+from typing import Optional, Type
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.database import open_read_session
+
+# Размер пачки строк, которую серверный курсор отдает за один раз
+STREAM_CHUNK_SIZE = 500
+
+
+def page_query(query: Select, model, limit: int, cursor: Optional[int] = None) -> Select:
+    """Запрос страницы по ключу id: на одну строку больше, чтобы узнать, есть ли следующая"""
+    if cursor is not None:
+        query = query.filter(model.id > cursor)
+    # id растет вместе с created_at, поэтому порядок по id совпадает с хронологическим
+    return query.order_by(model.id).limit(limit + 1)
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model,
+    response: Response,
+    limit: int,
+    cursor: Optional[int] = None
+):
+    """Получить страницу по ключу id; курсор следующей страницы - в заголовке X-Next-Cursor"""
+    result = await db.execute(page_query(query, model, limit, cursor))
+    items = result.scalars().all()
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = str(items[-1].id)
+    return items
+
+
+def stream_ndjson(query: Select, model, schema: Type[BaseModel], cursor: Optional[int] = None) -> StreamingResponse:
+    """Отдать результат запроса в формате NDJSON, читая строки серверным курсором"""
+    if cursor is not None:
+        query = query.filter(model.id > cursor)
+    query = query.order_by(model.id).execution_options(yield_per=STREAM_CHUNK_SIZE)
+
+    async def generate():
+        # Отдельная сессия: ответ продолжает отправляться после выхода из обработчика
+        async with await open_read_session() as db:
+            result = await db.stream(query)
+            async for item in result.scalars():
+                yield schema.model_validate(item).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -0,0 +1,87 @@
+import asyncio
+import hmac
+import logging
+import os
+import time
+import uuid
+from urllib.parse import parse_qs
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # профилирование - необязательная зависимость
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+# Интервал выборки стека в секундах
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# html - интерактивный отчет pyinstrument, speedscope - флейм-граф для https://www.speedscope.app
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "html")
+
+
+def profiling_available() -> bool:
+    return Profiler is not None
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по заголовку X-Profile или параметру ?profile=.
+
+    Значение должно совпадать с PROFILING_TOKEN. Отчет сохраняется в PROFILE_DIR,
+    имя файла возвращается в заголовке ответа X-Profile-File. Профилировщик в процессе
+    один: пока он занят, остальные запросы выполняются без профиля.
+    """
+
+    def __init__(self, app, token: str, directory: str = PROFILE_DIR, format: str = PROFILE_FORMAT):
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        self.format = format
+        self._lock = asyncio.Lock()
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                return True
+        if PROFILE_QUERY.encode() in scope["query_string"]:
+            values = parse_qs(scope["query_string"].decode()).get(PROFILE_QUERY, [])
+            return any(hmac.compare_digest(value.encode(), self.token) for value in values)
+        return False
+
+    def _save(self, profiler, path: str):
+        renderer = SpeedscopeRenderer() if self.format == "speedscope" else HTMLRenderer()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(profiler.output(renderer))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._lock.locked():
+            logger.warning("Профилировщик занят, %s %s выполняется без профиля", scope["method"], scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        extension = "json" if self.format == "speedscope" else "html"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.{extension}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", filename.encode())]
+            await send(message)
+
+        async with self._lock:
+            profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.stop()
+                # Отчет по большому профилю рендерится долго: не блокируем цикл событий
+                path = os.path.join(self.directory, filename)
+                await asyncio.get_running_loop().run_in_executor(None, self._save, profiler, path)
+                logger.info("Профиль %s %s сохранен в %s", scope["method"], scope["path"], path)
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable
+from sqlalchemy import Integer, DateTime, cast, delete, func, insert, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from models.database import SessionLocal, UPSERT_DIALECTS, upsert
+from models.models import (
+    Booking, Transaction, ComputerHourOccupancy, DailyRevenue, OccupancyDelta, RollupCheckpoint,
+    ComputerHourOccupancyStaging, DailyRevenueStaging
+)
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+# Размер пачки строк при пересборке агрегатов
+BACKFILL_BATCH_SIZE = 5000
+# Строк в одном INSERT ... ON CONFLICT (у SQLite есть предел числа параметров запроса)
+UPSERT_BATCH_SIZE = 1000
+# Строки моложе этого интервала свертка не трогает: они могут быть еще не закоммичены
+FOLD_LAG = timedelta(seconds=30)
+
+
+def hour_slices(start: datetime, end: datetime):
+    """Разбить интервал на части по календарным часам: (начало часа, секунд внутри часа)"""
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    while hour < end:
+        next_hour = hour + HOUR
+        yield hour, int((min(end, next_hour) - max(start, hour)).total_seconds())
+        hour = next_hour
+
+
+def check_dialect(engine: AsyncEngine):
+    """Проверить при запуске, что база поддерживает INSERT ... ON CONFLICT"""
+    if engine.dialect.name not in UPSERT_DIALECTS:
+        raise RuntimeError(f"Агрегаты не поддерживают диалект {engine.dialect.name}")
+
+
+async def _upsert(db: AsyncSession, model, keys: tuple, rows: list):
+    """Прибавить значения к существующим строкам агрегата или вставить новые одним запросом"""
+    for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+        statement = upsert(db, model).values(batch)
+        columns = [column for column in batch[0] if column not in keys]
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: getattr(model, column) + getattr(statement.excluded, column) for column in columns}
+        ))
+
+
+async def record_bookings(db: AsyncSession, bookings: Iterable, sign: int = 1):
+    """Записать изменения почасовой загрузки (sign=-1 при отмене) в журнал occupancy_deltas.
+
+    Выполняется в транзакции самого бронирования, коммит остается за вызывающим кодом.
+    Только вставка: строки агрегата не блокируются, в агрегат журнал переносит fold().
+    """
+    deltas = defaultdict(int)
+    for booking in bookings:
+        for hour, seconds in hour_slices(booking.start_time, booking.end_time):
+            deltas[booking.computer_id, hour] += sign * seconds
+    if not deltas:
+        # Пустой список параметров SQLAlchemy превратил бы в вставку одной строки из NULL
+        return
+    now = datetime.utcnow()
+    await db.execute(insert(OccupancyDelta), [
+        {"computer_id": computer_id, "hour": hour, "booked_seconds": seconds, "created_at": now}
+        for (computer_id, hour), seconds in deltas.items()
+    ])
+
+
+async def _lock_checkpoint(db: AsyncSession, name: str) -> RollupCheckpoint:
+    """Создать контрольную точку при первом обращении и заблокировать ее до конца транзакции"""
+    await db.execute(
+        upsert(db, RollupCheckpoint)
+        .values(name=name, last_id=0, updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    result = await db.execute(select(RollupCheckpoint).filter(RollupCheckpoint.name == name).with_for_update())
+    return result.scalar_one()
+
+
+async def _watermarks(db: AsyncSession) -> tuple:
+    """Последние id журнала загрузки и транзакций, которые точно закоммичены"""
+    cutoff = datetime.utcnow() - FOLD_LAG
+    occupancy_id = await db.scalar(
+        select(func.max(OccupancyDelta.id)).filter(OccupancyDelta.created_at <= cutoff)
+    )
+    revenue_id = await db.scalar(
+        select(func.max(Transaction.id)).filter(Transaction.created_at <= cutoff)
+    )
+    return occupancy_id or 0, revenue_id or 0
+
+
+async def _revenue_totals(db: AsyncSession, *filters) -> dict:
+    """Суммы и число транзакций по (день, тип); день считается в Python, одинаково для всех диалектов"""
+    revenue = defaultdict(lambda: [0.0, 0])
+    transactions = await db.stream(
+        select(Transaction.created_at, Transaction.type, Transaction.amount)
+        .filter(*filters)
+        .execution_options(yield_per=BACKFILL_BATCH_SIZE)
+    )
+    async for created_at, type, amount in transactions:
+        totals = revenue[created_at.date(), type]
+        totals[0] += amount
+        totals[1] += 1
+    return revenue
+
+
+async def fold(db: AsyncSession) -> dict:
+    """Перенести новые строки журнала загрузки и новые транзакции в агрегаты.
+
+    Выручка считается прямо по transactions от контрольной точки, поэтому списания и
+    пополнения не обновляют одну на всех строку дня. Контрольные точки блокируются,
+    так что параллельные свертки в разных процессах не учтут строки дважды.
+    """
+    occupancy = await _lock_checkpoint(db, "occupancy")
+    revenue = await _lock_checkpoint(db, "revenue")
+    occupancy_id, revenue_id = await _watermarks(db)
+
+    occupancy_rows = []
+    if occupancy_id > occupancy.last_id:
+        result = await db.execute(
+            select(OccupancyDelta.computer_id, OccupancyDelta.hour, func.sum(OccupancyDelta.booked_seconds))
+            .filter(OccupancyDelta.id > occupancy.last_id, OccupancyDelta.id <= occupancy_id)
+            .group_by(OccupancyDelta.computer_id, OccupancyDelta.hour)
+            .order_by(OccupancyDelta.computer_id, OccupancyDelta.hour)
+        )
+        occupancy_rows = [
+            {"computer_id": computer_id, "hour": hour, "booked_seconds": seconds}
+            for computer_id, hour, seconds in result.all()
+        ]
+        await _upsert(db, ComputerHourOccupancy, ("computer_id", "hour"), occupancy_rows)
+        await db.execute(delete(OccupancyDelta).where(OccupancyDelta.id <= occupancy_id))
+        occupancy.last_id = occupancy_id
+        occupancy.updated_at = datetime.utcnow()
+
+    revenue_rows = {}
+    if revenue_id > revenue.last_id:
+        revenue_rows = await _revenue_totals(
+            db, Transaction.id > revenue.last_id, Transaction.id <= revenue_id
+        )
+        await _upsert(db, DailyRevenue, ("day", "type"), [
+            {"day": day, "type": type, "amount": amount, "count": count}
+            for (day, type), (amount, count) in sorted(revenue_rows.items())
+        ])
+        revenue.last_id = revenue_id
+        revenue.updated_at = datetime.utcnow()
+
+    await db.commit()
+    return {"occupancy_rows": len(occupancy_rows), "revenue_rows": len(revenue_rows)}
+
+
+async def run_folding(interval: float):
+    """Периодически сворачивать журнал в агрегаты в фоне"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with SessionLocal() as db:
+                await fold(db)
+        except Exception:
+            logger.exception("Ошибка свертки агрегатов")
+
+
+async def _insert_batches(db: AsyncSession, model, rows: list):
+    for offset in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        await db.execute(insert(model), rows[offset:offset + BACKFILL_BATCH_SIZE])
+
+
+async def _build_occupancy(db: AsyncSession, occupancy_id: int) -> int:
+    """Собрать загрузку в staging-таблицу: бронирования минус журнал после контрольной точки.
+
+    Бронирования и журнал читаются одним запросом, то есть из одного снимка базы.
+    Строки журнала после occupancy_id уже отражены в бронированиях, а после подмены
+    их еще раз добавит свертка, поэтому здесь они вычитаются.
+    """
+    rows = 0
+    current_computer = None
+    deltas = defaultdict(int)
+
+    async def flush():
+        nonlocal rows
+        await _insert_batches(db, ComputerHourOccupancyStaging, [
+            {"computer_id": current_computer, "hour": hour, "booked_seconds": seconds}
+            for hour, seconds in sorted(deltas.items())
+        ])
+        rows += len(deltas)
+        deltas.clear()
+
+    source = union_all(
+        select(
+            Booking.computer_id.label("computer_id"),
+            Booking.start_time.label("start_time"),
+            Booking.end_time.label("end_time"),
+            cast(null(), Integer).label("seconds")
+        ).filter(Booking.status != "cancelled"),
+        select(
+            OccupancyDelta.computer_id,
+            OccupancyDelta.hour,
+            cast(null(), DateTime),
+            -OccupancyDelta.booked_seconds
+        ).filter(OccupancyDelta.id > occupancy_id)
+    ).subquery()
+    # Строки идут по компьютерам, поэтому в памяти держим часы только одного компьютера
+    result = await db.stream(
+        select(source).order_by(source.c.computer_id).execution_options(yield_per=BACKFILL_BATCH_SIZE)
+    )
+    async for computer_id, start_time, end_time, seconds in result:
+        if computer_id != current_computer:
+            await flush()
+            current_computer = computer_id
+        if seconds is not None:
+            deltas[start_time] += seconds
+            continue
+        for hour, booked in hour_slices(start_time, end_time):
+            deltas[hour] += booked
+    await flush()
+    return rows
+
+
+async def backfill(db: AsyncSession) -> dict:
+    """Пересобрать агрегаты загрузки и выручки из таблиц бронирований и транзакций.
+
+    Агрегаты собираются в staging-таблицах и подменяют основные в той же транзакции.
+    Бронирования и транзакции пишут только в журнал и transactions, поэтому пересборка
+    их не блокирует; ждет только фоновая свертка, чьи контрольные точки заблокированы.
+    В SQLite любая запись блокирует базу целиком, так что там пересборка все же
+    останавливает остальные записи.
+    """
+    occupancy = await _lock_checkpoint(db, "occupancy")
+    revenue = await _lock_checkpoint(db, "revenue")
+    occupancy_id, revenue_id = await _watermarks(db)
+
+    await db.execute(delete(ComputerHourOccupancyStaging))
+    await db.execute(delete(DailyRevenueStaging))
+    occupancy_rows = await _build_occupancy(db, occupancy_id)
+    revenue_totals = await _revenue_totals(db, Transaction.id <= revenue_id)
+    await _insert_batches(db, DailyRevenueStaging, [
+        {"day": day, "type": type, "amount": amount, "count": count}
+        for (day, type), (amount, count) in sorted(revenue_totals.items())
+    ])
+
+    # Подмена: читатели видят старые агрегаты до коммита
+    await db.execute(delete(ComputerHourOccupancy))
+    await db.execute(insert(ComputerHourOccupancy).from_select(
+        ["computer_id", "hour", "booked_seconds"],
+        select(
+            ComputerHourOccupancyStaging.computer_id,
+            ComputerHourOccupancyStaging.hour,
+            ComputerHourOccupancyStaging.booked_seconds
+        )
+    ))
+    await db.execute(delete(DailyRevenue))
+    await db.execute(insert(DailyRevenue).from_select(
+        ["day", "type", "amount", "count"],
+        select(DailyRevenueStaging.day, DailyRevenueStaging.type, DailyRevenueStaging.amount, DailyRevenueStaging.count)
+    ))
+    await db.execute(delete(ComputerHourOccupancyStaging))
+    await db.execute(delete(DailyRevenueStaging))
+
+    await db.execute(delete(OccupancyDelta).where(OccupancyDelta.id <= occupancy_id))
+    occupancy.last_id = occupancy_id
+    revenue.last_id = revenue_id
+    occupancy.updated_at = revenue.updated_at = datetime.utcnow()
+    await db.commit()
+    return {"occupancy_rows": occupancy_rows, "revenue_rows": len(revenue_totals)}
@@ -0,0 +1,201 @@
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class SlotHold:
+    hold_id: str
+    user_id: int
+    computer_id: int
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+
+class SlotHoldStore:
+    """Кратковременные эксклюзивные удержания слотов (компьютер, интервал) в памяти процесса.
+
+    Подходит для одного воркера; при нескольких процессах нужен RedisSlotHoldStore.
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = timedelta(seconds=ttl)
+        self._holds: Dict[str, SlotHold] = {}
+        # computer_id -> hold_id -> удержание
+        self._by_computer: Dict[int, Dict[str, SlotHold]] = {}
+
+    async def acquire(self, user_id: int, computer_id: int, start_time: datetime, end_time: datetime) -> Optional[SlotHold]:
+        """Удержать слот; None, если его уже удерживает другой пользователь"""
+        if await self.conflicts(computer_id, start_time, end_time, user_id):
+            return None
+        hold = SlotHold(
+            hold_id=uuid.uuid4().hex,
+            user_id=user_id,
+            computer_id=computer_id,
+            start_time=start_time,
+            end_time=end_time,
+            expires_at=datetime.utcnow() + self.ttl
+        )
+        self._holds[hold.hold_id] = hold
+        self._by_computer.setdefault(computer_id, {})[hold.hold_id] = hold
+        return hold
+
+    async def conflicts(self, computer_id: int, start_time: datetime, end_time: datetime, user_id: int) -> bool:
+        """Пересекается ли интервал с действующим удержанием другого пользователя"""
+        self._purge(computer_id)
+        return any(
+            hold.user_id != user_id and hold.start_time < end_time and hold.end_time > start_time
+            for hold in self._by_computer.get(computer_id, {}).values()
+        )
+
+    async def get(self, hold_id: str) -> Optional[SlotHold]:
+        hold = self._holds.get(hold_id)
+        if hold is None or hold.expires_at <= datetime.utcnow():
+            return None
+        return hold
+
+    async def release(self, hold_id: str):
+        self._remove(hold_id)
+
+    def _remove(self, hold_id: str):
+        hold = self._holds.pop(hold_id, None)
+        if hold is None:
+            return
+        holds = self._by_computer.get(hold.computer_id)
+        if holds is not None:
+            holds.pop(hold_id, None)
+            if not holds:
+                del self._by_computer[hold.computer_id]
+
+    def _purge(self, computer_id: int):
+        now = datetime.utcnow()
+        for hold_id, hold in list(self._by_computer.get(computer_id, {}).items()):
+            if hold.expires_at <= now:
+                self._remove(hold_id)
+
+
+# Удержания компьютера хранятся в хэше hold_id -> {user_id, start, end, expires} (миллисекунды).
+# Проверка и запись выполняются одним скриптом, поэтому два процесса не получат пересекающиеся
+# удержания. Время истечения берется по часам Redis, общим для всех воркеров.
+_SCAN_HOLDS = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local holds = redis.call('HGETALL', KEYS[1])
+for i = 1, #holds, 2 do
+    local hold = cjson.decode(holds[i + 1])
+    if hold.expires <= now_ms then
+        redis.call('HDEL', KEYS[1], holds[i])
+    elseif hold.user_id ~= tonumber(ARGV[1]) and hold.start < tonumber(ARGV[3]) and hold['end'] > tonumber(ARGV[2]) then
+        return -1
+    end
+end
+"""
+
+_ACQUIRE = _SCAN_HOLDS + """
+local expires = now_ms + tonumber(ARGV[5])
+local hold = {user_id = tonumber(ARGV[1]), start = tonumber(ARGV[2]), ['end'] = tonumber(ARGV[3]), expires = expires}
+redis.call('HSET', KEYS[1], ARGV[4], cjson.encode(hold))
+-- Все удержания живут одинаково, поэтому хэш истекает вместе с самым новым
+redis.call('PEXPIRE', KEYS[1], ARGV[5])
+redis.call('SET', KEYS[2], ARGV[6], 'PX', ARGV[5])
+return expires
+"""
+
+_CONFLICTS = _SCAN_HOLDS + """
+return 0
+"""
+
+
+def _ms(value: datetime) -> int:
+    return int((value - EPOCH).total_seconds() * 1000)
+
+
+class RedisSlotHoldStore:
+    """Удержания слотов в Redis, общие для всех процессов API"""
+
+    def __init__(self, ttl: float = 10.0, client=None, url: Optional[str] = None, prefix: str = "pc_club:"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost"), decode_responses=True)
+        self.ttl = timedelta(seconds=ttl)
+        self._client = client
+        self._prefix = prefix
+        self._acquire = client.register_script(_ACQUIRE)
+        self._conflicts = client.register_script(_CONFLICTS)
+
+    def _computer_key(self, computer_id: int) -> str:
+        return f"{self._prefix}slot_holds:{computer_id}"
+
+    def _hold_key(self, hold_id: str) -> str:
+        return f"{self._prefix}slot_hold:{hold_id}"
+
+    async def acquire(self, user_id: int, computer_id: int, start_time: datetime, end_time: datetime) -> Optional[SlotHold]:
+        """Удержать слот; None, если его уже удерживает другой пользователь"""
+        hold_id = uuid.uuid4().hex
+        data = json.dumps({
+            "user_id": user_id,
+            "computer_id": computer_id,
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat()
+        })
+        expires = await self._acquire(
+            keys=[self._computer_key(computer_id), self._hold_key(hold_id)],
+            args=[user_id, _ms(start_time), _ms(end_time), hold_id, int(self.ttl.total_seconds() * 1000), data]
+        )
+        if expires < 0:
+            return None
+        return SlotHold(
+            hold_id=hold_id,
+            user_id=user_id,
+            computer_id=computer_id,
+            start_time=start_time,
+            end_time=end_time,
+            expires_at=EPOCH + timedelta(milliseconds=expires)
+        )
+
+    async def conflicts(self, computer_id: int, start_time: datetime, end_time: datetime, user_id: int) -> bool:
+        """Пересекается ли интервал с действующим удержанием другого пользователя"""
+        result = await self._conflicts(
+            keys=[self._computer_key(computer_id)],
+            args=[user_id, _ms(start_time), _ms(end_time)]
+        )
+        return result < 0
+
+    async def get(self, hold_id: str) -> Optional[SlotHold]:
+        key = self._hold_key(hold_id)
+        async with self._client.pipeline(transaction=True) as pipe:
+            data, ttl_ms = await pipe.get(key).pttl(key).execute()
+        if data is None or ttl_ms <= 0:
+            return None
+        hold = json.loads(data)
+        return SlotHold(
+            hold_id=hold_id,
+            user_id=hold["user_id"],
+            computer_id=hold["computer_id"],
+            start_time=datetime.fromisoformat(hold["start_time"]),
+            end_time=datetime.fromisoformat(hold["end_time"]),
+            expires_at=datetime.utcnow() + timedelta(milliseconds=ttl_ms)
+        )
+
+    async def release(self, hold_id: str):
+        hold = await self.get(hold_id)
+        if hold is None:
+            return
+        async with self._client.pipeline(transaction=True) as pipe:
+            await pipe.hdel(self._computer_key(hold.computer_id), hold_id).delete(self._hold_key(hold_id)).execute()
+
+
+def create_slot_hold_store(ttl: float):
+    """Выбрать хранилище удержаний по SLOT_HOLD_BACKEND (memory или redis), по умолчанию как у кэша"""
+    if os.getenv("SLOT_HOLD_BACKEND", os.getenv("CACHE_BACKEND", "memory")) == "redis":
+        return RedisSlotHoldStore(ttl=ttl)
+    return SlotHoldStore(ttl=ttl)
+
+
+slot_holds = create_slot_hold_store(float(os.getenv("SLOT_HOLD_TTL", "10")))
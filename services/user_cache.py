@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повторной подпиской после обрыва соединения с Redis
+RECONNECT_DELAY = 1.0
+
+
+class CachedUser(NamedTuple):
+    user_id: int
+    balance: float
+
+
+class TelegramUserCache:
+    """Ограниченный LRU-кэш telegram_id -> (id пользователя, снимок баланса) с временем жизни"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[int, Tuple[float, CachedUser]]" = OrderedDict()
+        # user_id -> telegram_id для инвалидации при изменении баланса
+        self._telegram_ids: Dict[int, int] = {}
+
+    def get(self, telegram_id: int) -> Optional[CachedUser]:
+        entry = self._data.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._pop(telegram_id)
+            return None
+        self._data.move_to_end(telegram_id)
+        return user
+
+    def put(self, telegram_id: int, user_id: int, balance: float) -> CachedUser:
+        user = CachedUser(user_id, balance)
+        self._data[telegram_id] = (time.monotonic() + self.ttl, user)
+        self._data.move_to_end(telegram_id)
+        self._telegram_ids[user_id] = telegram_id
+        while len(self._data) > self.maxsize:
+            self._pop(next(iter(self._data)))
+        return user
+
+    def invalidate_user(self, user_id: int):
+        """Сбросить запись пользователя после изменения баланса"""
+        telegram_id = self._telegram_ids.get(user_id)
+        if telegram_id is not None:
+            self._pop(telegram_id)
+
+    def clear(self):
+        self._data.clear()
+        self._telegram_ids.clear()
+
+    def _pop(self, telegram_id: int):
+        entry = self._data.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[1].user_id, None)
+
+
+telegram_users = TelegramUserCache(
+    maxsize=int(os.getenv("TELEGRAM_USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TELEGRAM_USER_CACHE_TTL", "300"))
+)
+
+
+class BalanceChannel:
+    """Сброс кэша балансов во всех процессах через Redis pub/sub.
+
+    Балансы меняют воркеры API, а кэш читает бот: без общего канала бот отвечал бы
+    старым балансом до истечения TTL. Сообщения, пропущенные во время обрыва
+    соединения, не восстановить, поэтому после переподключения кэш очищается целиком.
+    """
+
+    def __init__(self, cache: TelegramUserCache, client=None, url: Optional[str] = None, prefix: str = "pc_club:"):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost"), decode_responses=True)
+        self.cache = cache
+        self.channel = f"{prefix}balance_changed"
+        self._client = client
+        self._task: Optional[asyncio.Task] = None
+        # Ссылки на задачи публикации, чтобы их не собрал сборщик мусора
+        self._pending: Set[asyncio.Task] = set()
+
+    def publish(self, user_ids: Iterable[int]):
+        """Отправить id пользователей в фоне; вызывается из синхронного обработчика коммита"""
+        message = ",".join(str(user_id) for user_id in user_ids)
+        if not message:
+            return
+        task = asyncio.get_running_loop().create_task(self._publish(message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, message: str):
+        try:
+            await self._client.publish(self.channel, message)
+        except Exception:
+            logger.exception("Не удалось разослать сброс кэша балансов")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        for user_id in message["data"].split(","):
+                            self.cache.invalidate_user(int(user_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Подписка на сброс кэша балансов прервана")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+def create_balance_channel() -> Optional[BalanceChannel]:
+    """Общий канал нужен, только если процессы делят Redis (CACHE_BACKEND=redis)"""
+    if os.getenv("CACHE_BACKEND", "memory") == "redis":
+        return BalanceChannel(telegram_users)
+    return None
+
+
+balance_channel = create_balance_channel()
+
+_CHANGED_KEY = "balance_changed_user_ids"
+
+
+def mark_balance_changed(db: AsyncSession, user_id: int):
+    """Запомнить пользователя, чей баланс изменился; кэш сбросится после коммита"""
+    db.sync_session.info.setdefault(_CHANGED_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    user_ids = session.info.pop(_CHANGED_KEY, ())
+    for user_id in user_ids:
+        telegram_users.invalidate_user(user_id)
+    if balance_channel is not None:
+        balance_channel.publish(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session):
+    session.info.pop(_CHANGED_KEY, None)